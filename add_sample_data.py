@@ -18,6 +18,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodbridge.settings")
 django.setup()
 
+from core.accounts import create_user
 from core.models import Donation, Profile
 from django.contrib.auth.models import User
 
@@ -26,21 +27,17 @@ def create_sample_data():
     """Create sample donation data with coordinates around Boston area"""
 
     # Get or create a test user
-    user, created = User.objects.get_or_create(
-        username="test_donor",
-        defaults={
-            "email": "test@example.com",
-            "first_name": "Test",
-            "last_name": "Donor",
-        },
-    )
-
-    if created:
-        user.set_password("testpass123")
-        user.save()
-
-        # Create profile
-        Profile.objects.create(user=user, role="donor")
+    user = User.objects.filter(username="test_donor").first()
+
+    if user is None:
+        user = create_user(
+            "test_donor",
+            "test@example.com",
+            "testpass123",
+            role="donor",
+            first_name="Test",
+            last_name="Donor",
+        )
         print(f"Created test user: {user.username}")
     else:
         # Ensure profile exists
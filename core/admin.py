@@ -1,5 +1,30 @@
 from django.contrib import admin
 
-from core.models import Donation
+from core.models import ArchivedDonation, Donation
 
 admin.site.register(Donation)
+
+
+@admin.register(ArchivedDonation)
+class ArchivedDonationAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "title",
+        "donor",
+        "quantity",
+        "is_claimed",
+        "claimed_by",
+        "created_at",
+        "archived_at",
+    ]
+    list_filter = ["is_claimed", "food_type"]
+    search_fields = ["title", "location", "donor__username"]
+    date_hierarchy = "created_at"
+    list_select_related = ["donor", "claimed_by"]
+
+    # The archive is a record; rows only arrive via archive_donations
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,260 @@
+"""Batch allocation of available donations to receivers' demand
+
+Instead of first come, first served claims, a periodic run hands out
+every open donation at once. Donations are taken soonest-expiring
+first; each goes to the eligible demand (in range, food type accepted,
+enough units still wanted, not the donor's own) with the lowest score,
+
+    FAIRNESS_WEIGHT * receiver's share already allocated
+    + DISTANCE_WEIGHT * distance / radius
+
+so receivers who have received the least of what they asked for, over
+all their active demands, are served first, and nearer ones among
+equals. Scores for a donation are
+computed with NumPy over all demands in its latitude band at once. The resulting claims
+are written in bulk.
+"""
+
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from core import counters
+from core.bulk import update_each
+from core.models import Demand, Donation, DonationState
+from core.notifications import KM_PER_DEGREE
+from core.routing import distances
+
+Result = namedtuple(
+    "Result",
+    ["donations", "demands", "allocated", "quantity", "receivers"],
+)
+
+
+def _available_donations():
+    return list(
+        Donation.objects.filter(
+            Q(expiry_date__isnull=True)
+            | Q(expiry_date__gte=timezone.localdate()),
+            is_claimed=False,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        )
+        .order_by(F("expiry_date").asc(nulls_last=True), "created_at")
+        .values_list(
+            "id",
+            "donor_id",
+            "quantity",
+            "food_type",
+            "latitude",
+            "longitude",
+            "created_at",
+        )
+    )
+
+
+def assign(donations, demands, receivers=None):
+    """Pick a demand for each donation; returns ``(donation, demand)``
+    index pairs. Both are lists of values_list rows as queried here.
+    ``receivers`` maps each user to ``(wanted, allocated)`` over all of
+    their active demand, defaulting to totals over ``demands``"""
+    config = settings.ALLOCATION
+    # Demands sorted by latitude, so the ones a donation could be in
+    # range of are a contiguous band found by binary search
+    order = np.argsort(
+        [demand[3] for demand in demands], kind="stable"
+    )
+    sorted_demands = [demands[index] for index in order]
+    latitudes = np.array([demand[3] for demand in sorted_demands])
+    longitudes = np.array([demand[4] for demand in sorted_demands])
+    users = np.array([demand[1] for demand in sorted_demands])
+    radius = np.array(
+        [demand[5] for demand in sorted_demands], dtype=float
+    )
+    wanted = np.array(
+        [demand[6] for demand in sorted_demands], dtype=float
+    )
+    allocated = np.array(
+        [demand[7] for demand in sorted_demands], dtype=float
+    )
+    # Fairness is per receiver, not per demand, so splitting one need
+    # into several demands earns no extra turns
+    receiver_ids, owner = np.unique(users, return_inverse=True)
+    if receivers is None:
+        receiver_wanted = np.bincount(owner, weights=wanted)
+        receiver_allocated = np.bincount(owner, weights=allocated)
+    else:
+        receiver_wanted, receiver_allocated = np.array(
+            [receivers[user] for user in receiver_ids.tolist()],
+            dtype=float,
+        ).T
+    band = radius.max() / KM_PER_DEGREE
+    accepts = {}
+    pairs = []
+    for index, donation in enumerate(donations):
+        low, high = np.searchsorted(
+            latitudes, [donation[4] - band, donation[4] + band]
+        )
+        if low == high:
+            continue
+        near = slice(low, high)
+        food_type = (donation[3] or "").strip().lower()
+        if food_type not in accepts:
+            accepts[food_type] = np.array(
+                [
+                    not demand[2] or food_type in demand[2]
+                    for demand in sorted_demands
+                ]
+            )
+        reach = distances(
+            [donation[4]],
+            [donation[5]],
+            latitudes[near],
+            longitudes[near],
+        )[0]
+        eligible = (
+            accepts[food_type][near]
+            & (reach <= radius[near])
+            & (wanted[near] - allocated[near] >= donation[2])
+            & (users[near] != donation[1])
+        )
+        if not eligible.any():
+            continue
+        score = (
+            config["FAIRNESS_WEIGHT"]
+            * receiver_allocated[owner[near]]
+            / receiver_wanted[owner[near]]
+            + config["DISTANCE_WEIGHT"] * reach / radius[near]
+        )
+        chosen = low + int(np.where(eligible, score, np.inf).argmin())
+        allocated[chosen] += donation[2]
+        receiver_allocated[owner[chosen]] += donation[2]
+        pairs.append((index, int(order[chosen])))
+    return pairs
+
+
+@transaction.atomic
+def write_claims(donations, demands, pairs, now):
+    """Claim one batch of assigned donations and update demand and
+    per-user aggregates; returns the pairs whose donation was still
+    open"""
+    update_each(
+        Donation,
+        ["is_claimed", "claimed_by", "claimed_at"],
+        ["id", "is_claimed"],
+        [
+            (
+                True,
+                demands[q][1],
+                connection.ops.adapt_datetimefield_value(now),
+                donations[d][0],
+                False,
+            )
+            for d, q in pairs
+        ],
+        null=["deleted_at"],
+    )
+    # Rows a concurrent claim took first keep their own claimed_at, and
+    # rows deleted since they were read stay unclaimed
+    claimed = set(
+        Donation.objects.filter(
+            pk__in=[donations[d][0] for d, _ in pairs],
+            is_claimed=True,
+            claimed_at=now,
+        ).values_list("id", flat=True)
+    )
+    pairs = [
+        pair for pair in pairs if donations[pair[0]][0] in claimed
+    ]
+
+    filled = Counter()
+    changes = []
+    for d, q in pairs:
+        _, donor_id, quantity = donations[d][:3]
+        filled[demands[q][0]] += quantity
+        before = DonationState(
+            donor_id, False, None, quantity, donations[d][6], None
+        )
+        changes.append(
+            (
+                before,
+                before._replace(
+                    is_claimed=True,
+                    claimed_by_id=demands[q][1],
+                    claimed_at=now,
+                ),
+            )
+        )
+    update_each(
+        Demand,
+        ["allocated"],
+        ["id"],
+        [(units, demand_id) for demand_id, units in filled.items()],
+        increment=True,
+    )
+    counters.record_many(changes)
+    return pairs
+
+
+def allocate(dry_run=False):
+    """Run one allocation over all open donations and active demand;
+    returns None without claiming anything while ALLOCATION["ENABLED"]
+    is off, when receivers claim for themselves. A dry run previews
+    either way"""
+    if not settings.ALLOCATION["ENABLED"] and not dry_run:
+        return None
+    batch_size = settings.ALLOCATION["BATCH_SIZE"]
+    donations = _available_donations()
+    demands = list(
+        Demand.objects.filter(
+            is_active=True, allocated__lt=F("quantity")
+        )
+        .order_by("id")
+        .values_list(
+            "id",
+            "user_id",
+            "food_types",
+            "latitude",
+            "longitude",
+            "radius_km",
+            "quantity",
+            "allocated",
+        )
+    )
+    receivers = {
+        user_id: (wanted, allocated)
+        for user_id, wanted, allocated in Demand.objects.filter(
+            is_active=True
+        )
+        .values("user_id")
+        .annotate(wanted=Sum("quantity"), allocated=Sum("allocated"))
+        .values_list("user_id", "wanted", "allocated")
+    }
+    pairs = (
+        assign(donations, demands, receivers)
+        if donations and demands
+        else []
+    )
+    if not dry_run:
+        now = timezone.now()
+        pairs = [
+            pair
+            for offset in range(0, len(pairs), batch_size)
+            for pair in write_claims(
+                donations,
+                demands,
+                pairs[offset : offset + batch_size],
+                now,
+            )
+        ]
+    return Result(
+        donations=len(donations),
+        demands=len(demands),
+        allocated=len(pairs),
+        quantity=sum(donations[d][2] for d, _ in pairs),
+        receivers=len({demands[q][1] for _, q in pairs}),
+    )
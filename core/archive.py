@@ -0,0 +1,93 @@
+"""Moving old claimed and expired donations out of the hot table
+
+Donations created more than ARCHIVE["RETENTION_DAYS"] ago that were
+claimed, or that expired unclaimed, are copied into ArchivedDonation
+and deleted, one batch per transaction, so the donations table every
+map and list query scans only grows with live data.
+
+Per-user aggregates are untouched: archived donations still count
+towards profile counters and impact buckets, and ``reconcile`` and
+``backfill`` read both tables. Images of archived donations are
+released.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ArchivedDonation, Donation
+
+ARCHIVED_FIELDS = [
+    field.attname
+    for field in ArchivedDonation._meta.concrete_fields
+    if field.name != "archived_at"
+]
+
+_archiving = ContextVar("archiving", default=False)
+
+
+@contextmanager
+def archiving():
+    """Deletes in the block are archival, not the end of a donation"""
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def is_archiving():
+    return _archiving.get()
+
+
+def eligible(now=None):
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.ARCHIVE["RETENTION_DAYS"])
+    return Donation.objects.filter(created_at__lt=cutoff).filter(
+        Q(is_claimed=True)
+        | Q(expiry_date__lt=timezone.localdate(now))
+    )
+
+
+@transaction.atomic
+def archive_batch(ids, now=None):
+    """Archive the donations among ``ids`` that are still eligible;
+    returns how many were moved"""
+    rows = list(
+        eligible(now).filter(pk__in=ids).values(*ARCHIVED_FIELDS)
+    )
+    ArchivedDonation.objects.bulk_create(
+        [ArchivedDonation(**row) for row in rows]
+    )
+    with archiving():
+        Donation.objects.filter(
+            pk__in=[row["id"] for row in rows]
+        ).delete()
+    return len(rows)
+
+
+def archive(batch_size=None, dry_run=False):
+    """Archive every eligible donation; returns the number moved, or
+    that would be with ``dry_run``"""
+    batch_size = batch_size or settings.ARCHIVE["BATCH_SIZE"]
+    now = timezone.now()
+    if dry_run:
+        return eligible(now).count()
+    moved = 0
+    last_id = 0
+    while True:
+        ids = list(
+            eligible(now)
+            .filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return moved
+        last_id = ids[-1]
+        moved += archive_batch(ids, now)
@@ -0,0 +1,83 @@
+"""Encode time and size of the largest responses in each format
+
+The payloads are fetched once from seeded benchmark data, then each
+renderer encodes them repeatedly; the JSON and MessagePack bodies are
+also compressed with gzip and, when installed, brotli, at the levels
+COMPRESSION configures.
+"""
+
+import statistics
+import time
+
+import msgpack
+from rest_framework.renderers import JSONRenderer
+
+from core import middleware
+from core.benchmarks.scenarios import ClientTransport
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+ENDPOINTS = {
+    "statistics": "/api/donations/statistics/?zoom=16",
+    "admin_donations": "/api/admin/donations/",
+    "donations": "/api/donations/",
+}
+
+RENDERERS = {
+    "json": JSONRenderer(),
+    "orjson": ORJSONRenderer(),
+    "msgpack": MessagePackRenderer(),
+}
+
+
+def fetch(context, path):
+    """The endpoint's data as plain Python values"""
+    client = ClientTransport(context.admin).client
+    response = client.get(path, HTTP_ACCEPT="application/msgpack")
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} returned {response.status_code}")
+    return msgpack.unpackb(response.content, strict_map_key=False)
+
+
+def timed(function, argument, repeats):
+    """Result of ``function(argument)`` and its median time in ms"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(argument)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def compress(coding):
+    def run(body):
+        encode, finish = middleware._compressor(coding)
+        return encode(body) + finish()
+
+    return run
+
+
+def run(context, repeats):
+    codings = ["gzip", "br"] if middleware.brotli else ["gzip"]
+    results = {}
+    for name, path in ENDPOINTS.items():
+        data = fetch(context, path)
+        formats = {}
+        for format, renderer in RENDERERS.items():
+            body, encode_ms = timed(renderer.render, data, repeats)
+            formats[format] = {
+                "bytes": len(body),
+                "encode_ms": encode_ms,
+            }
+            if format == "json":
+                # Same bytes as orjson's; compressed once for both
+                continue
+            for coding in codings:
+                compressed, compress_ms = timed(
+                    compress(coding), body, repeats
+                )
+                formats[format][coding] = {
+                    "bytes": len(compressed),
+                    "compress_ms": compress_ms,
+                }
+        results[name] = formats
+    return results
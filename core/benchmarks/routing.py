@@ -0,0 +1,88 @@
+"""Route planner timings on synthetic stops, without HTTP or a database"""
+
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from core import routing
+from core.benchmarks.data import CITIES
+from core.benchmarks.scenarios import percentile
+
+
+def random_stops(rng, size, departure):
+    """``size`` stops scattered around a city; a quarter of them due
+    within a few hours"""
+    _, latitude, longitude = rng.choice(CITIES)
+    stops = [
+        (
+            index,
+            latitude + rng.gauss(0, 0.08),
+            longitude + rng.gauss(0, 0.08),
+            (
+                departure + timedelta(hours=rng.uniform(1, 6))
+                if rng.random() < 0.25
+                else None
+            ),
+        )
+        for index in range(size)
+    ]
+    return (latitude, longitude), stops
+
+
+def nearest_neighbour_km(start, stops, departure):
+    """Length of the unrefined nearest-neighbour route, for comparison"""
+    matrix = routing.distance_matrix(
+        [start[0]] + [stop[1] for stop in stops],
+        [start[1]] + [stop[2] for stop in stops],
+    )
+    deadlines = np.array(
+        [np.inf]
+        + [
+            (
+                (stop[3] - departure).total_seconds()
+                if stop[3]
+                else np.inf
+            )
+            for stop in stops
+        ]
+    )
+    route = routing.nearest_neighbour(matrix, deadlines)
+    return float(matrix[route[:-1], route[1:]].sum())
+
+
+def run(sizes, repeats, seed=0):
+    rng = random.Random(seed)
+    departure = timezone.now()
+    results = {}
+    for size in sizes:
+        timings = []
+        baseline = optimized = late = 0.0
+        for _ in range(repeats):
+            start, stops = random_stops(rng, size, departure)
+            began = time.perf_counter()
+            route = routing.plan(start, stops, departure)
+            timings.append((time.perf_counter() - began) * 1000)
+            baseline += nearest_neighbour_km(start, stops, departure)
+            optimized += route.distance_km
+            late += sum(stop.late for stop in route.stops)
+        timings.sort()
+        results[str(size)] = {
+            "repeats": repeats,
+            "latency_ms": {
+                "p50": percentile(timings, 0.50),
+                "p95": percentile(timings, 0.95),
+                "max": timings[-1],
+            },
+            "nearest_neighbour_km_mean": baseline / repeats,
+            "optimized_km_mean": optimized / repeats,
+            "improvement_pct": (
+                (baseline - optimized) / baseline * 100
+                if baseline
+                else 0
+            ),
+            "late_stops_mean": late / repeats,
+        }
+    return results
@@ -0,0 +1,381 @@
+"""Scripted request mixes run against seeded benchmark data"""
+
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmarks.data import CITIES, PASSWORD, PREFIX
+from core.models import Donation
+from core.querylog import QueryInspector
+
+ZOOM_LEVELS = (8, 10, 12, 14, 16)
+
+
+class Sample:
+    __slots__ = ("seconds", "status", "queries", "size")
+
+    def __init__(self, seconds, status, queries, size):
+        self.seconds = seconds
+        self.status = status
+        self.queries = queries
+        self.size = size
+
+
+class ClientTransport:
+    """Requests through the Django test client, counting SQL"""
+
+    def __init__(self, user):
+        self.user = user
+        token = RefreshToken.for_user(user).access_token
+        self.client = Client(
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+            SERVER_NAME="localhost",
+        )
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data) if data is not None else ""
+        with QueryInspector() as inspector:
+            start = time.perf_counter()
+            response = self.client.generic(
+                method, path, body, content_type="application/json"
+            )
+            seconds = time.perf_counter() - start
+        return Sample(
+            seconds,
+            response.status_code,
+            len(inspector.queries),
+            len(response.content),
+        )
+
+
+class HttpTransport:
+    """Requests against a running server; query counts are unknown"""
+
+    def __init__(self, user, base_url):
+        self.user = user
+        self.base_url = base_url.rstrip("/")
+        self.token = str(RefreshToken.for_user(user).access_token)
+
+    def request(self, method, path, data=None):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=(
+                json.dumps(data).encode()
+                if data is not None
+                else None
+            ),
+            method=method,
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/json",
+            },
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            body = error.read()
+            status = error.code
+        return Sample(
+            time.perf_counter() - start, status, None, len(body)
+        )
+
+
+class BenchmarkContext:
+    def __init__(self, seed=0, base_url=None, concurrency=8):
+        self.rng = random.Random(seed)
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.donor_ids = list(
+            User.objects.filter(
+                username__startswith=f"{PREFIX}donor_"
+            ).values_list("id", flat=True)
+        )
+        self.receivers = list(
+            User.objects.filter(
+                username__startswith=f"{PREFIX}receiver_"
+            )[: max(concurrency, 1)]
+        )
+        self.admin = User.objects.filter(
+            username=f"{PREFIX}admin"
+        ).first()
+        if not (self.donor_ids and self.receivers and self.admin):
+            raise RuntimeError(
+                "No benchmark data found; run seed_benchmark first."
+            )
+
+    def transport(self, user):
+        if self.base_url:
+            return HttpTransport(user, self.base_url)
+        return ClientTransport(user)
+
+
+def map_pans(context, count):
+    """Statistics requests for random viewports at varying zoom"""
+    transport = context.transport(context.receivers[0])
+    rng = context.rng
+    samples = []
+    for _ in range(count):
+        _, latitude, longitude = rng.choice(CITIES)
+        zoom = rng.choice(ZOOM_LEVELS)
+        # Roughly the span of a phone-sized map at this zoom
+        half_span = 180 / 2**zoom
+        latitude += rng.gauss(0, 0.05)
+        longitude += rng.gauss(0, 0.05)
+        samples.append(
+            transport.request(
+                "GET",
+                "/api/donations/statistics/"
+                f"?lat_min={latitude - half_span}"
+                f"&lat_max={latitude + half_span}"
+                f"&lng_min={longitude - half_span}"
+                f"&lng_max={longitude + half_span}"
+                f"&zoom={zoom}",
+            )
+        )
+    return samples
+
+
+def donor_lists(context, count):
+    """Donors listing their own donations, and donation detail pages
+
+    The API has no pagination, so the per-donor lists are the list
+    requests whose size stays realistic as the table grows.
+    """
+    rng = context.rng
+    donors = [
+        context.transport(donor)
+        for donor in User.objects.filter(
+            id__in=rng.sample(
+                context.donor_ids, min(len(context.donor_ids), 8)
+            )
+        )
+    ]
+    detail = context.transport(context.receivers[0])
+    donation_ids = list(
+        Donation.objects.filter(donor_id__in=context.donor_ids)
+        .order_by("?")
+        .values_list("id", flat=True)[:count]
+    )
+    samples = []
+    for index in range(count):
+        if index % 2 or not donation_ids:
+            transport = rng.choice(donors)
+            path = f"/api/users/{transport.user.pk}/donations/"
+        else:
+            transport = detail
+            path = f"/api/donations/{rng.choice(donation_ids)}/"
+        samples.append(transport.request("GET", path))
+    return samples
+
+
+def concurrent_claims(context, count):
+    """Receivers racing to claim from the same pool of donations"""
+    pool = list(
+        Donation.objects.filter(
+            is_claimed=False, donor_id__in=context.donor_ids
+        ).values_list("id", flat=True)[: max(count // 2, 1)]
+    )
+    if not pool:
+        return []
+    seeds = [context.rng.random() for _ in range(context.concurrency)]
+    per_thread = max(count // context.concurrency, 1)
+    samples = []
+    lock = threading.Lock()
+
+    def claim(receiver, seed):
+        rng = random.Random(seed)
+        transport = context.transport(receiver)
+        mine = []
+        try:
+            for _ in range(per_thread):
+                mine.append(
+                    transport.request(
+                        "POST",
+                        f"/api/donations/{rng.choice(pool)}/claim/",
+                    )
+                )
+        finally:
+            close_old_connections()
+        with lock:
+            samples.extend(mine)
+
+    threads = [
+        threading.Thread(
+            target=claim,
+            args=(
+                context.receivers[index % len(context.receivers)],
+                seeds[index],
+            ),
+        )
+        for index in range(context.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def logins(context, count):
+    """Concurrent token requests, like kiosks signing in at opening
+
+    Each thread signs in as its own receiver; 503s mean the hashing
+    queue was full.
+    """
+    per_thread = max(count // context.concurrency, 1)
+    samples = []
+    lock = threading.Lock()
+
+    def sign_in(user):
+        transport = context.transport(user)
+        credentials = {
+            "username": user.username,
+            "password": PASSWORD,
+        }
+        mine = []
+        try:
+            for _ in range(per_thread):
+                mine.append(
+                    transport.request(
+                        "POST", "/api/token/", credentials
+                    )
+                )
+        finally:
+            close_old_connections()
+        with lock:
+            samples.extend(mine)
+
+    threads = [
+        threading.Thread(
+            target=sign_in,
+            args=(context.receivers[index % len(context.receivers)],),
+        )
+        for index in range(context.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def pickup_routes(context, count):
+    """Receivers planning pickups through their claimed donations"""
+    rng = context.rng
+    transports = [
+        context.transport(receiver) for receiver in context.receivers
+    ]
+    samples = []
+    for _ in range(count):
+        _, latitude, longitude = rng.choice(CITIES)
+        samples.append(
+            rng.choice(transports).request(
+                "GET",
+                "/api/donations/route/"
+                f"?lat={latitude + rng.gauss(0, 0.05)}"
+                f"&lng={longitude + rng.gauss(0, 0.05)}",
+            )
+        )
+    return samples
+
+
+def admin_dashboard(context, count):
+    """The admin statistics page and donation management list"""
+    transport = context.transport(context.admin)
+    samples = []
+    for index in range(count):
+        path = (
+            "/api/admin/stats/"
+            if index % 4
+            else "/api/admin/donations/"
+        )
+        samples.append(transport.request("GET", path))
+    return samples
+
+
+SCENARIOS = {
+    "map_pans": map_pans,
+    "donor_lists": donor_lists,
+    "concurrent_claims": concurrent_claims,
+    "admin_dashboard": admin_dashboard,
+    "logins": logins,
+    "pickup_routes": pickup_routes,
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(int(round(fraction * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(sample.seconds * 1000 for sample in samples)
+    queries = [
+        sample.queries
+        for sample in samples
+        if sample.queries is not None
+    ]
+    return {
+        "requests": len(samples),
+        "statuses": dict(
+            Counter(sample.status for sample in samples)
+        ),
+        "errors": sum(
+            1 for sample in samples if sample.status >= 500
+        ),
+        "throughput_rps": (
+            len(samples) / wall_seconds if wall_seconds else None
+        ),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": (
+                sum(latencies) / len(latencies) if latencies else None
+            ),
+            "max": latencies[-1] if latencies else None,
+        },
+        "queries": (
+            {
+                "mean": sum(queries) / len(queries),
+                "max": max(queries),
+            }
+            if queries
+            else None
+        ),
+        "response_bytes_mean": (
+            sum(sample.size for sample in samples) / len(samples)
+            if samples
+            else None
+        ),
+    }
+
+
+def run(context, names, count):
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        samples = SCENARIOS[name](context, count)
+        results[name] = summarize(
+            samples, time.perf_counter() - start
+        )
+    return results
+
+
+def dumps(report):
+    return json.dumps(report, indent=2, sort_keys=True)
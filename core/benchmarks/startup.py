@@ -0,0 +1,141 @@
+"""Cold start of a web worker, per settings profile
+
+Each sample is a fresh interpreter that loads the WSGI application the
+way ``foodbridge.wsgi`` does, optionally warms it up, and serves one
+request to the API root. Boot time and the first request are reported
+separately, since warming up moves work from one to the other. One more
+run under ``python -X importtime`` attributes the imports to packages.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+from core.benchmarks.scenarios import percentile
+
+PROFILES = ("full", "api")
+
+# Modules imported eagerly at startup whose cumulative cost is
+# reported on its own: core.signals is imported by CoreConfig.ready()
+WATCHED = ("core.signals",)
+
+# Runs in the child; prints its timings as JSON
+BOOT = """
+import json, resource, sys, time
+
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+if sys.argv[1] == "warm":
+    from core.warmup import warm
+
+    warm()
+booted = time.perf_counter()
+
+from wsgiref.util import setup_testing_defaults
+
+environ = {"PATH_INFO": "/api/"}
+setup_testing_defaults(environ)
+statuses = []
+response = application(environ, lambda status, _: statuses.append(status))
+b"".join(response)
+print(json.dumps({
+    "boot_ms": (booted - start) * 1000,
+    "first_request_ms": (time.perf_counter() - booted) * 1000,
+    "status": statuses[0],
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+def _run(profile, warm, importtime=False):
+    environ = dict(
+        os.environ,
+        FOODBRIDGE_PROFILE=profile,
+        PYTHONPATH=os.pathsep.join(
+            [str(settings.BASE_DIR), os.environ.get("PYTHONPATH", "")]
+        ),
+    )
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", BOOT, "warm" if warm else "cold"]
+    result = subprocess.run(
+        command,
+        env=environ,
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    if not sample["status"].startswith("200"):
+        raise RuntimeError(
+            f"First request returned {sample['status']}"
+        )
+    return sample, result.stderr
+
+
+def imports(stderr, top):
+    """Module count, total and the ``top`` slowest top-level packages
+    from ``-X importtime`` output, by their own (self) time, and the
+    cumulative time of the WATCHED modules"""
+    packages = {}
+    watched = {}
+    count = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.split(":", 1)[1].split("|")
+        name = name.strip()
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+        if name in WATCHED:
+            watched[name] = int(cumulative) / 1000
+        count += 1
+    slowest = sorted(packages.items(), key=lambda item: -item[1])
+    return {
+        "modules": count,
+        "total_ms": sum(packages.values()) / 1000,
+        "packages_ms": {
+            package: micros / 1000
+            for package, micros in slowest[:top]
+        },
+        "modules_ms": watched,
+    }
+
+
+def _summary(values):
+    ordered = sorted(values)
+    return {
+        "p50": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+    }
+
+
+def run(repeats, top):
+    results = {}
+    for profile in PROFILES:
+        for warm in (False, True):
+            samples = [_run(profile, warm)[0] for _ in range(repeats)]
+            results[f"{profile}_{'warm' if warm else 'cold'}"] = {
+                "boot_ms": _summary([s["boot_ms"] for s in samples]),
+                "first_request_ms": _summary(
+                    [s["first_request_ms"] for s in samples]
+                ),
+                "ready_ms": _summary(
+                    [
+                        s["boot_ms"] + s["first_request_ms"]
+                        for s in samples
+                    ]
+                ),
+                "max_rss_mb": max(s["max_rss_kb"] for s in samples)
+                / 1024,
+            }
+        _, stderr = _run(profile, True, importtime=True)
+        results[f"{profile}_warm"]["imports"] = imports(stderr, top)
+    return results
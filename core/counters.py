@@ -0,0 +1,199 @@
+"""Per-user donation counters kept on Profile
+
+Every write adjusts the counters with in-place increments, so
+concurrent requests never overwrite each other's updates. ``reconcile``
+recomputes them from the donations tables for anything that slipped
+past (raw SQL, restored backups, older rows).
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import Count, Max, Q
+
+from core import leaderboard
+from core.bulk import update_each
+from core.models import ArchivedDonation, Donation, Profile
+
+COUNTERS = ("donations_made", "active_donations", "claims_made")
+
+
+def contribution(state):
+    """Counter values one donation in this state adds, per user"""
+    counts = defaultdict(Counter)
+    if state.donor_id:
+        counts[state.donor_id]["donations_made"] += 1
+        counts[state.donor_id][
+            "active_donations"
+        ] += not state.is_claimed
+    if state.is_claimed and state.claimed_by_id:
+        counts[state.claimed_by_id]["claims_made"] += 1
+    return counts
+
+
+def difference(old, new):
+    """Per-user deltas moving a donation from state ``old`` to ``new``;
+    either may be None for a donation that does not exist"""
+    deltas = defaultdict(Counter)
+    for user_id, counts in (contribution(new) if new else {}).items():
+        deltas[user_id].update(counts)
+    for user_id, counts in (contribution(old) if old else {}).items():
+        deltas[user_id].subtract(counts)
+    return deltas
+
+
+def latest_donations(user_ids):
+    """``{user_id: datetime}`` of each user's newest live or archived
+    donation, None for users with none left"""
+    latest = dict.fromkeys(user_ids)
+    for model in (Donation, ArchivedDonation):
+        for user_id, last in (
+            model.objects.filter(donor_id__in=latest)
+            .values("donor_id")
+            .annotate(last=Max("created_at"))
+            .values_list("donor_id", "last")
+        ):
+            latest[user_id] = max(
+                filter(None, (latest[user_id], last))
+            )
+    return latest
+
+
+def record(old, new):
+    """Update every per-user aggregate for a donation moving from
+    ``old`` to ``new`` (DonationState, or None when absent)"""
+    stamps = {}
+    if old is None and new is not None:
+        stamps[new.donor_id] = new.created_at
+    elif old is not None and new is None and old.donor_id:
+        # The removed donation may have been the newest; recomputed
+        # the way reconcile does, so the two never disagree
+        stamps = latest_donations([old.donor_id])
+    apply(difference(old, new), stamps)
+    leaderboard.apply(leaderboard.difference(old, new))
+
+
+def apply(deltas, stamps=None):
+    """Apply ``{user_id: Counter}`` deltas and ``{user_id: datetime}``
+    last-donation stamps as in-place increments"""
+    increments = [
+        (*(counts.get(name, 0) for name in COUNTERS), user_id)
+        for user_id, counts in sorted(deltas.items())
+        if any(counts.get(name) for name in COUNTERS)
+    ]
+    update_each(
+        Profile, COUNTERS, ["user"], increments, increment=True
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    update_each(
+        Profile,
+        ["last_donation_at"],
+        ["user"],
+        [
+            (adapt(stamp), user_id)
+            for user_id, stamp in sorted((stamps or {}).items())
+        ],
+    )
+
+
+def record_many(changes):
+    """``record`` for many ``(old, new)`` changes, in one pass of
+    chunked UPDATEs rather than one per donation"""
+    counts = defaultdict(Counter)
+    buckets = defaultdict(Counter)
+    stamps = {}
+    removed = set()
+    for old, new in changes:
+        for user_id, delta in difference(old, new).items():
+            counts[user_id].update(delta)
+        for key, delta in leaderboard.difference(old, new).items():
+            buckets[key].update(delta)
+        if old is None and new is not None:
+            stamps[new.donor_id] = max(
+                new.created_at,
+                stamps.get(new.donor_id, new.created_at),
+            )
+        elif old is not None and new is None and old.donor_id:
+            removed.add(old.donor_id)
+    # Read after the rows changed, so this covers any created above
+    stamps.update(latest_donations(removed))
+    apply(counts, stamps)
+    leaderboard.apply(buckets)
+
+
+def record_created(states):
+    """Aggregates for donations bulk inserted without signals"""
+    record_many((None, state) for state in states)
+
+
+def reconcile(batch_size=1000, user_ids=None):
+    """Recompute profile counters, for every user unless ``user_ids``
+    is given; returns how many profiles changed"""
+    queryset = Profile.objects.order_by("id")
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    fixed = 0
+    last_id = 0
+    while True:
+        profiles = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not profiles:
+            return fixed
+        last_id = profiles[-1].id
+        user_ids = [profile.user_id for profile in profiles]
+        # Archived donations still count
+        donated = {}
+        claimed = Counter()
+        for model in (Donation, ArchivedDonation):
+            for row in (
+                model.objects.filter(donor_id__in=user_ids)
+                .values("donor_id")
+                .annotate(
+                    made=Count("id"),
+                    active=Count("id", filter=Q(is_claimed=False)),
+                    last=Max("created_at"),
+                )
+            ):
+                total = donated.setdefault(
+                    row["donor_id"], {"made": 0, "active": 0}
+                )
+                total["made"] += row["made"]
+                total["active"] += row["active"]
+                total["last"] = max(
+                    filter(None, (total.get("last"), row["last"]))
+                )
+            claimed.update(
+                dict(
+                    model.objects.filter(
+                        claimed_by_id__in=user_ids, is_claimed=True
+                    )
+                    .values("claimed_by_id")
+                    .annotate(count=Count("id"))
+                    .values_list("claimed_by_id", "count")
+                )
+            )
+        changed = []
+        for profile in profiles:
+            row = donated.get(profile.user_id, {})
+            actual = (
+                row.get("made", 0),
+                row.get("active", 0),
+                claimed.get(profile.user_id, 0),
+                row.get("last"),
+            )
+            if actual != (
+                profile.donations_made,
+                profile.active_donations,
+                profile.claims_made,
+                profile.last_donation_at,
+            ):
+                (
+                    profile.donations_made,
+                    profile.active_donations,
+                    profile.claims_made,
+                    profile.last_donation_at,
+                ) = actual
+                changed.append(profile)
+        Profile.objects.bulk_update(
+            changed, [*COUNTERS, "last_donation_at"]
+        )
+        fixed += len(changed)
@@ -0,0 +1,128 @@
+"""Soft deletion of donations and background deletion of users
+
+Deleting a donation only stamps ``deleted_at``: the default manager
+hides it from then on and the per-user aggregates drop it at once.
+``purge_donations`` removes the rows, and releases their images, in
+small batches once SOFT_DELETE["PURGE_AFTER_HOURS"] have passed; each
+deletion queues it for then, one task per hour with deletions.
+
+Deleting a user used to cascade through all their donations in one
+transaction, holding SQLite's write lock for as long as that took.
+Now the request only deactivates the account and queues
+``delete_user``, which works through the user's rows a batch per
+transaction before deleting what is left.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from core import counters
+from core.models import ArchivedDonation, Donation, DonationState
+from core.tasks import enqueue, task
+
+
+@transaction.atomic
+def soft_delete(ids):
+    """Mark the live donations among ``ids`` deleted and take them
+    out of the aggregates; returns how many were deleted"""
+    states = [
+        DonationState(*row)
+        for row in Donation.objects.select_for_update()
+        .filter(pk__in=ids)
+        .values_list(*DonationState._fields)
+    ]
+    now = timezone.now()
+    deleted = Donation.objects.filter(pk__in=ids).update(
+        deleted_at=now
+    )
+    counters.record_many((state, None) for state in states)
+    if deleted:
+        schedule_purge(now)
+    return deleted
+
+
+def schedule_purge(deleted_at):
+    """Queue the purge of donations deleted at ``deleted_at``: at the
+    top of the hour after they become old enough, shared by every
+    deletion made within the same hour"""
+    run_at = deleted_at + timedelta(
+        hours=settings.SOFT_DELETE["PURGE_AFTER_HOURS"] + 1
+    )
+    run_at = run_at.replace(minute=0, second=0, microsecond=0)
+    return enqueue(
+        purge_donations,
+        key=f"purge-donations:{run_at:%Y%m%d%H}",
+        delay=run_at - timezone.now(),
+    )
+
+
+def _batches(queryset):
+    """Primary keys of ``queryset`` a batch at a time, re-querying
+    after each batch is dealt with"""
+    batch_size = settings.SOFT_DELETE["BATCH_SIZE"]
+    while ids := list(
+        queryset.order_by("pk").values_list("pk", flat=True)[
+            :batch_size
+        ]
+    ):
+        yield ids
+
+
+def _purge(ids):
+    # Deleted rows are already out of the aggregates; the delete
+    # signal only releases their images
+    with transaction.atomic():
+        _, deleted = Donation.all_objects.filter(pk__in=ids).delete()
+    return deleted.get(Donation._meta.label, 0)
+
+
+@task()
+def purge_donations():
+    """Physically delete donations soft-deleted long enough ago;
+    returns how many were removed"""
+    cutoff = timezone.now() - timedelta(
+        hours=settings.SOFT_DELETE["PURGE_AFTER_HOURS"]
+    )
+    return sum(
+        _purge(ids)
+        for ids in _batches(
+            Donation.all_objects.filter(deleted_at__lte=cutoff)
+        )
+    )
+
+
+@task()
+def delete_user(user_id):
+    """Delete a user and everything of theirs, a batch at a time"""
+    if not User.objects.filter(pk=user_id).exists():
+        return
+    for ids in _batches(Donation.objects.filter(donor_id=user_id)):
+        soft_delete(ids)
+    for ids in _batches(
+        Donation.all_objects.filter(donor_id=user_id)
+    ):
+        _purge(ids)
+    for ids in _batches(
+        ArchivedDonation.objects.filter(donor_id=user_id)
+    ):
+        ArchivedDonation.objects.filter(pk__in=ids).delete()
+    # What on_delete=SET_NULL would do to their claims
+    for manager in (Donation.all_objects, ArchivedDonation.objects):
+        for ids in _batches(manager.filter(claimed_by_id=user_id)):
+            manager.filter(pk__in=ids).update(claimed_by=None)
+    User.objects.filter(pk=user_id).delete()
+
+
+@transaction.atomic
+def schedule_user_deletion(user):
+    """Deactivate ``user`` now and delete them in the background"""
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    return enqueue(
+        delete_user,
+        {"user_id": user.pk},
+        key=f"delete-user:{user.pk}",
+    )
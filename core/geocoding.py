@@ -0,0 +1,254 @@
+"""Server-side geocoding of donation locations, backed by a cache table"""
+
+import json
+import logging
+import re
+import time
+import unicodedata
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core import notifications
+from core.models import Donation, GeocodeCache
+from core.tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s#]")
+_ABBREVIATIONS = {
+    "street": "st",
+    "avenue": "ave",
+    "road": "rd",
+    "boulevard": "blvd",
+    "drive": "dr",
+    "north": "n",
+    "south": "s",
+    "east": "e",
+    "west": "w",
+}
+
+# Fallback places for the offline provider when no gazetteer file is set
+BUILTIN_PLACES = {
+    "miami": (25.7617, -80.1918),
+    "miami beach": (25.7907, -80.1300),
+    "south beach": (25.7826, -80.1341),
+    "downtown miami": (25.7743, -80.1937),
+    "little havana": (25.7657, -80.2191),
+    "coral gables": (25.7215, -80.2684),
+    "wynwood": (25.8010, -80.1994),
+    "boston": (42.3601, -71.0589),
+    "cambridge": (42.3736, -71.1097),
+    "chicago": (41.8781, -87.6298),
+    "austin": (30.2672, -97.7431),
+    "seattle": (47.6062, -122.3321),
+}
+
+
+def normalize_address(address):
+    """Canonical cache key: case, accents, punctuation and common
+    abbreviations folded so trivially different spellings match"""
+    address = unicodedata.normalize("NFKD", address or "")
+    address = address.encode("ascii", "ignore").decode().lower()
+    words = _PUNCTUATION.sub(" ", address).split()
+    return " ".join(_ABBREVIATIONS.get(word, word) for word in words)[
+        :255
+    ]
+
+
+class GazetteerProvider:
+    """Offline provider matching known place names inside an address
+
+    Uses the JSON file in GEOCODING["GAZETTEER"] (``{"place": [lat,
+    lng]}``) when set, else a small built-in list. Deterministic, so
+    it doubles as the stand-in for tests and local development.
+    """
+
+    name = "gazetteer"
+
+    def __init__(self, options):
+        places = BUILTIN_PLACES
+        if options.get("GAZETTEER"):
+            with open(options["GAZETTEER"]) as fh:
+                places = json.load(fh)
+        self.places = {
+            normalize_address(place): tuple(point)
+            for place, point in places.items()
+        }
+
+    def geocode(self, addresses):
+        results = {}
+        for address in addresses:
+            padded = f" {address} "
+            matches = [
+                place
+                for place in self.places
+                if f" {place} " in padded
+            ]
+            # Prefer the most specific (longest) place mentioned
+            best = max(matches, key=len, default=None)
+            results[address] = self.places[best] if best else None
+        return results
+
+
+class NominatimProvider:
+    """OpenStreetMap Nominatim, throttled to one request per second"""
+
+    name = "nominatim"
+    url = "https://nominatim.openstreetmap.org/search"
+
+    def __init__(self, options):
+        self.user_agent = options.get(
+            "USER_AGENT", "foodbridge-backend"
+        )
+        self.timeout = options.get("TIMEOUT", 10)
+        self._last_request = 0.0
+
+    def geocode(self, addresses):
+        results = {}
+        for address in addresses:
+            wait = 1.0 - (time.monotonic() - self._last_request)
+            if wait > 0:
+                time.sleep(wait)
+            query = urllib.parse.urlencode(
+                {"q": address, "format": "json", "limit": 1}
+            )
+            request = urllib.request.Request(
+                f"{self.url}?{query}",
+                headers={"User-Agent": self.user_agent},
+            )
+            try:
+                with urllib.request.urlopen(
+                    request, timeout=self.timeout
+                ) as response:
+                    found = json.load(response)
+            except OSError as error:
+                # Leave it uncached so a later run retries
+                logger.warning(
+                    "Geocoding %r failed: %s", address, error
+                )
+                continue
+            finally:
+                self._last_request = time.monotonic()
+            results[address] = (
+                (float(found[0]["lat"]), float(found[0]["lon"]))
+                if found
+                else None
+            )
+        return results
+
+
+def get_provider():
+    options = settings.GEOCODING
+    return import_string(options["PROVIDER"])(options)
+
+
+def lookup_cached(addresses):
+    """Cached results for normalized ``addresses``
+
+    Addresses the provider could not place are cached as None so they
+    are not asked about again; addresses never looked up are omitted.
+    """
+    return {
+        entry.address: entry.point
+        for entry in GeocodeCache.objects.filter(
+            address__in=set(addresses)
+        )
+    }
+
+
+def geocode_many(locations, provider=None):
+    """Resolve free-text locations, asking the provider only about
+    normalized addresses that have never been looked up"""
+    addresses = {
+        normalize_address(location) for location in locations
+    }
+    addresses.discard("")
+    known = lookup_cached(addresses)
+    unknown = addresses - known.keys()
+    if unknown:
+        provider = provider or get_provider()
+        found = provider.geocode(sorted(unknown))
+        GeocodeCache.objects.bulk_create(
+            [
+                GeocodeCache(
+                    address=address,
+                    latitude=point[0] if point else None,
+                    longitude=point[1] if point else None,
+                    provider=provider.name,
+                )
+                for address, point in found.items()
+            ],
+            ignore_conflicts=True,
+        )
+        known.update(found)
+    return {
+        location: known.get(normalize_address(location))
+        for location in locations
+    }
+
+
+def geocode_missing_donations(
+    batch_size=500, limit=None, provider=None
+):
+    """Fill coordinates for donations without them; returns the count
+    of donations updated"""
+    provider = provider or get_provider()
+    updated = 0
+    last_id = 0
+    while limit is None or updated < limit:
+        batch = list(
+            Donation.objects.filter(
+                latitude__isnull=True,
+                longitude__isnull=True,
+                id__gt=last_id,
+            )
+            .order_by("id")
+            .only("id", "location")[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        points = geocode_many(
+            [donation.location for donation in batch], provider
+        )
+        located = []
+        for donation in batch:
+            point = points.get(donation.location)
+            if point:
+                donation.latitude, donation.longitude = point
+                located.append(donation)
+        Donation.objects.bulk_update(
+            located, ["latitude", "longitude"]
+        )
+        updated += len(located)
+    return updated
+
+
+@task()
+def geocode_donation(donation_id):
+    donation = Donation.objects.filter(
+        pk=donation_id,
+        latitude__isnull=True,
+        longitude__isnull=True,
+    ).first()
+    if donation is None:
+        return
+    point = geocode_many([donation.location])[donation.location]
+    if point:
+        Donation.objects.filter(pk=donation_id).update(
+            latitude=point[0], longitude=point[1]
+        )
+        # Receivers can only be matched once the donation is placed
+        notifications.schedule_donation(donation_id)
+
+
+def schedule_donation(donation_id):
+    """Queue geocoding of one new donation"""
+    return enqueue(
+        geocode_donation,
+        {"donation_id": donation_id},
+        key=f"geocode:{donation_id}",
+    )
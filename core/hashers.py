@@ -0,0 +1,145 @@
+"""Password hashing policy per role and bounded hash verification
+
+Each role maps to a hasher in PASSWORD_HASHING["POLICY"]. Logins
+verify against the account's policy hasher rather than Django's
+default, so a stored hash from another hasher (or older parameters)
+is re-encoded with the policy hasher on the next successful login.
+Hashing runs on a small dedicated pool, which caps the CPU a login
+storm can take; once the queue is full further logins get a 503
+instead of piling up. The request thread still waits for its hash, so
+it stays busy for the whole login either way.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import (
+    ScryptPasswordHasher,
+    check_password,
+    get_hasher,
+    make_password,
+)
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PartnerScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt for donor and receiver accounts, which sign in in bursts
+    from shared kiosks; keeps the 16 MiB memory cost of Django's
+    scrypt but runs a single lane instead of five"""
+
+    algorithm = "scrypt_partner"
+    parallelism = 1
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        "Too many sign-ins in progress, try again shortly."
+    )
+    default_code = "hashing_busy"
+
+
+def hasher_for_role(role):
+    policy = settings.PASSWORD_HASHING["POLICY"]
+    return get_hasher(policy.get(role, "default"))
+
+
+def hasher_for_user(user):
+    if user.is_staff:
+        return hasher_for_role("staff")
+    profile = getattr(user, "profile", None)
+    return hasher_for_role(profile.role if profile else None)
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            config = settings.PASSWORD_HASHING
+            _executor = ThreadPoolExecutor(
+                max_workers=config["WORKERS"],
+                thread_name_prefix="hashing",
+            )
+            _slots = threading.BoundedSemaphore(
+                config["WORKERS"] + config["QUEUE_SIZE"]
+            )
+    return _executor, _slots
+
+
+def run_bounded(function, *args):
+    """Run ``function`` on the hashing pool, blocking the caller until
+    it finishes; raises HashingBusy when no slot frees up in time"""
+    executor, slots = _pool()
+    if not slots.acquire(
+        timeout=settings.PASSWORD_HASHING["QUEUE_TIMEOUT"]
+    ):
+        raise HashingBusy
+    try:
+        return executor.submit(function, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password, role=None):
+    """Encode ``password`` with the hasher the policy gives ``role``"""
+    if password is None:
+        return make_password(None)
+    return run_bounded(
+        make_password, password, None, hasher_for_role(role)
+    )
+
+
+def _verify(password, encoded, preferred):
+    """Check a password; returns ``(valid, upgraded)`` where upgraded
+    is a re-encoded hash when the stored one is not ``preferred``"""
+    upgraded = []
+    valid = check_password(
+        password,
+        encoded,
+        lambda raw: upgraded.append(
+            make_password(raw, None, preferred)
+        ),
+        preferred,
+    )
+    return valid, (upgraded[0] if upgraded else None)
+
+
+class PolicyModelBackend(ModelBackend):
+    """ModelBackend that verifies with the role's policy hasher"""
+
+    def authenticate(
+        self, request, username=None, password=None, **kwargs
+    ):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.select_related(
+                "profile"
+            ).get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Hash anyway with the slowest policy, so an unknown
+            # username can't be told from a staff account by timing
+            hash_password(
+                password, settings.PASSWORD_HASHING["UNKNOWN_USERS"]
+            )
+            return None
+
+        valid, upgraded = run_bounded(
+            _verify, password, user.password, hasher_for_user(user)
+        )
+        if not (valid and self.user_can_authenticate(user)):
+            return None
+        if upgraded:
+            user.password = upgraded
+            user.save(update_fields=["password"])
+        return user
@@ -0,0 +1,200 @@
+"""Idempotency-Key support for write endpoints
+
+A client that sends ``Idempotency-Key: <unique value>`` with a write
+can retry it safely: the first request runs and its response is
+stored, and a retry with the same key and the same request gets that
+response back, marked ``Idempotent-Replayed: true``, without running
+again. Reusing a key for a different request is a 422, and retrying
+while the first attempt is still running is a 409. Keys are scoped
+per user, or per IP address for anonymous clients, and expire after
+IDEMPOTENCY["TTL_HOURS"].
+
+The fingerprint covers the method, path and body; uploaded files are
+represented by the digest the upload handler computed while streaming,
+so they are never read a second time.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import IdempotencyRecord
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "A request with this Idempotency-Key is still in progress."
+    )
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = (
+        "This Idempotency-Key was used for a different request."
+    )
+    default_code = "idempotency_key_mismatch"
+
+
+class Replay(Exception):
+    """Raised from ``initial`` to short-circuit to a stored response"""
+
+    def __init__(self, record):
+        self.record = record
+
+
+def fingerprint(request):
+    """SHA-256 of the method, path and a canonical form of the body"""
+    data = request.data
+    if hasattr(data, "lists"):
+        # Form data: every value of every field, uploads by digest
+        body = {
+            name: [
+                (
+                    f"file:{getattr(value, 'content_hash', None) or value.size}"
+                    if hasattr(value, "read")
+                    else value
+                )
+                for value in values
+            ]
+            for name, values in data.lists()
+        }
+    else:
+        body = data
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(
+        json.dumps(body, cls=JSONEncoder, sort_keys=True).encode()
+    )
+    return digest.hexdigest()
+
+
+def _scope(request):
+    if request.user and request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    # Anonymous clients (registration) are told apart by address, the
+    # same one rate limiting uses, so one client's key can't collide
+    # with, or replay the response of, another's
+    return f"ip:{BaseThrottle().get_ident(request)}"[:50]
+
+
+def begin(request, key):
+    """Claim ``key`` for this request; raises Replay when it already
+    has a stored response"""
+    config = settings.IDEMPOTENCY
+    now = timezone.now()
+    scope = _scope(request)
+    digest = fingerprint(request)
+    # Expired keys are free again; so are keys whose request died
+    # without recording a response
+    IdempotencyRecord.objects.filter(scope=scope, key=key).filter(
+        expires_at__lte=now
+    ).delete()
+    IdempotencyRecord.objects.filter(
+        scope=scope,
+        key=key,
+        status_code__isnull=True,
+        created_at__lte=now
+        - timedelta(seconds=config["IN_PROGRESS_TIMEOUT"]),
+    ).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(
+                scope=scope,
+                key=key,
+                method=request.method,
+                path=request.path[:255],
+                fingerprint=digest,
+                expires_at=now + timedelta(hours=config["TTL_HOURS"]),
+            )
+    except IntegrityError:
+        record = IdempotencyRecord.objects.filter(
+            scope=scope, key=key
+        ).first()
+    if record is None:
+        # Deleted between the insert and the lookup; let the client
+        # retry rather than run the request unguarded
+        raise IdempotencyKeyInUse
+    if record.fingerprint != digest:
+        raise IdempotencyKeyMismatch
+    if record.status_code is None:
+        raise IdempotencyKeyInUse
+    raise Replay(record)
+
+
+def finish(record, response):
+    """Store the response of the request that claimed ``record``;
+    server errors release the key so the request can be retried"""
+    if response is None or response.status_code >= 500:
+        record.delete()
+        return
+    record.status_code = response.status_code
+    # Round-trip through the API's encoder so dates, decimals and
+    # lazy strings are stored exactly as they were rendered
+    record.response_body = (
+        json.loads(json.dumps(response.data, cls=JSONEncoder))
+        if response.data is not None
+        else None
+    )
+    record.save(update_fields=["status_code", "response_body"])
+
+
+def purge_expired():
+    deleted, _ = IdempotencyRecord.objects.filter(
+        expires_at__lte=timezone.now()
+    ).delete()
+    return deleted
+
+
+class IdempotencyMixin:
+    """Honours Idempotency-Key on the view's write methods"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._idempotency_record = None
+        header = settings.IDEMPOTENCY["HEADER"]
+        key = request.headers.get(header)
+        if request.method not in WRITE_METHODS or key is None:
+            return
+        if not 0 < len(key) <= 255:
+            raise ValidationError(
+                {header: "Must be between 1 and 255 characters."}
+            )
+        self._idempotency_record = begin(request, key)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            return Response(
+                exc.record.response_body,
+                status=exc.record.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            record = getattr(self, "_idempotency_record", None)
+            if record is not None:
+                record.delete()
+                self._idempotency_record = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        record = getattr(self, "_idempotency_record", None)
+        if record is not None:
+            self._idempotency_record = None
+            finish(record, response)
+        return super().finalize_response(
+            request, response, *args, **kwargs
+        )
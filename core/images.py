@@ -0,0 +1,143 @@
+import io
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from core.models import Donation
+from core.tasks import enqueue, task
+
+FORMAT_EXTENSIONS = {
+    "WEBP": "webp",
+    "AVIF": "avif",
+    "JPEG": "jpg",
+    "PNG": "png",
+}
+
+# Striped locks so a task and a lazy request never encode the same image
+# twice within a process
+_variant_locks = [threading.Lock() for _ in range(32)]
+
+
+def _field():
+    return Donation._meta.get_field("image")
+
+
+def _storage():
+    return _field().storage
+
+
+def _extension():
+    return FORMAT_EXTENSIONS[settings.DONATION_IMAGE_FORMAT]
+
+
+def _encode(image, max_dimension):
+    """Shrink an image to fit ``max_dimension`` and re-encode it"""
+    image = image.copy()
+    image.thumbnail((max_dimension, max_dimension))
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or (
+            "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    # No exif/icc arguments are passed, so metadata is dropped here
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        format=settings.DONATION_IMAGE_FORMAT,
+        quality=settings.DONATION_IMAGE_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def stored_upload(upload):
+    """Name of an already processed copy of ``upload``, if there is one
+
+    Uploads streamed through ``DonationImageUploadHandler`` carry the
+    hash of their original bytes, which is also the name the processed
+    image is stored under, so a re-upload is found without decoding it.
+    """
+    digest = getattr(upload, "content_hash", None)
+    if not digest:
+        return None
+    name = _storage().hashed_name(
+        _field().generate_filename(None, f"upload.{_extension()}"),
+        digest,
+    )
+    return name if _storage().exists(name) else None
+
+
+def normalize_upload(upload):
+    """Resize, strip metadata and re-encode an uploaded image"""
+    max_dimension = settings.DONATION_IMAGE_MAX_DIMENSION
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # Lets the JPEG decoder scale down while decoding
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        data = _encode(image, max_dimension)
+
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    content = ContentFile(data, name=f"{stem}.{_extension()}")
+    # Keep the processed copy under the hash of the original upload
+    content.content_hash = getattr(upload, "content_hash", None)
+    return content
+
+
+def variant_name(name, variant):
+    """Storage name of ``variant`` for the original image ``name``"""
+    stem = os.path.splitext(name)[0]
+    return f"{stem}_{variant}.{_extension()}"
+
+
+@task()
+def generate_variants(name, variants=None):
+    """Create any missing variants of the stored image ``name``"""
+    storage = _storage()
+    sizes = settings.DONATION_IMAGE_VARIANTS
+    with _variant_locks[hash(name) % len(_variant_locks)]:
+        missing = [
+            variant
+            for variant in (variants or sizes)
+            if not storage.exists(variant_name(name, variant))
+        ]
+        if not missing:
+            return []
+
+        with storage.open(name) as fh, Image.open(fh) as image:
+            image.load()
+            for variant in missing:
+                storage.save_exact(
+                    variant_name(name, variant),
+                    ContentFile(_encode(image, sizes[variant])),
+                )
+    return missing
+
+
+def schedule_variants(name):
+    """Queue generation of the variants of ``name``"""
+    return enqueue(
+        generate_variants, {"name": name}, key=f"variants:{name}"
+    )
+
+
+def ensure_variant(name, variant):
+    """Return the storage name of a variant, generating it if missing"""
+    target = variant_name(name, variant)
+    if not _storage().exists(target):
+        generate_variants(name, [variant])
+    return target
+
+
+def variant_urls(name):
+    """Map each configured variant to its URL; variant names are fixed,
+    so no storage lookups. Variants are built by the task queued on
+    upload, or on first request to the donation-image route"""
+    storage = _storage()
+    return {
+        variant: storage.url(variant_name(name, variant))
+        for variant in settings.DONATION_IMAGE_VARIANTS
+    }
@@ -0,0 +1,165 @@
+"""Donor and receiver rankings from daily impact buckets
+
+Each donation adds one to its donor's bucket for the day it was
+posted and, once claimed, one to its receiver's bucket for the day of
+the claim. A ranking sums at most ``window`` days of buckets per user
+instead of scanning the donations table.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from core.bulk import update_each
+from core.models import ArchivedDonation, Donation, ImpactBucket
+
+METRICS = ("count", "quantity")
+
+
+def _day(value):
+    return (
+        timezone.localdate(value) if value else timezone.localdate()
+    )
+
+
+def contribution(state):
+    """``{(user_id, role, day): (count, quantity)}`` for one donation"""
+    buckets = {}
+    if state.donor_id:
+        buckets[(state.donor_id, "donor", _day(state.created_at))] = (
+            1,
+            state.quantity,
+        )
+    if state.is_claimed and state.claimed_by_id:
+        day = _day(state.claimed_at or state.created_at)
+        buckets[(state.claimed_by_id, "receiver", day)] = (
+            1,
+            state.quantity,
+        )
+    return buckets
+
+
+def difference(old, new):
+    deltas = defaultdict(Counter)
+    for key, (count, quantity) in (
+        contribution(new) if new else {}
+    ).items():
+        deltas[key].update(count=count, quantity=quantity)
+    for key, (count, quantity) in (
+        contribution(old) if old else {}
+    ).items():
+        deltas[key].subtract(count=count, quantity=quantity)
+    return deltas
+
+
+def apply(deltas):
+    """Add ``{(user_id, role, day): Counter}`` deltas to the buckets"""
+    deltas = {
+        key: delta
+        for key, delta in deltas.items()
+        if delta["count"] or delta["quantity"]
+    }
+    if not deltas:
+        return
+    # Make sure every bucket being added to exists, then increment in
+    # place so concurrent writers never overwrite each other. Pure
+    # decrements don't create rows: a cascading user delete would
+    # otherwise recreate buckets its own cascade just removed
+    ImpactBucket.objects.bulk_create(
+        [
+            ImpactBucket(user_id=user_id, role=role, day=day)
+            for (user_id, role, day), delta in deltas.items()
+            if delta["count"] > 0 or delta["quantity"] > 0
+        ],
+        ignore_conflicts=True,
+    )
+    adapt = connection.ops.adapt_datefield_value
+    update_each(
+        ImpactBucket,
+        METRICS,
+        ["user", "role", "day"],
+        [
+            (
+                delta["count"],
+                delta["quantity"],
+                user_id,
+                role,
+                adapt(day),
+            )
+            for (user_id, role, day), delta in sorted(deltas.items())
+        ],
+        increment=True,
+    )
+
+
+def top(role, window, metric="quantity", limit=10):
+    """The ``limit`` users with the highest ``metric`` over the last
+    ``window`` days, today included"""
+    since = timezone.localdate() - timedelta(days=window - 1)
+    other = "count" if metric == "quantity" else "quantity"
+    return list(
+        ImpactBucket.objects.filter(role=role, day__gte=since)
+        .values("user_id", "user__username")
+        .annotate(count=Sum("count"), quantity=Sum("quantity"))
+        .filter(**{f"{metric}__gt": 0})
+        .order_by(f"-{metric}", f"-{other}", "user_id")[:limit]
+    )
+
+
+def _bucket_rows(model):
+    """``(role, rows)`` of per-user, per-day totals in ``model``'s
+    table, rows being ``(user_id, day, count, quantity)``"""
+    donated = (
+        model.objects.annotate(day=TruncDate("created_at"))
+        .values("donor_id", "day")
+        .annotate(count=Count("id"), quantity=Sum("quantity"))
+        .values_list("donor_id", "day", "count", "quantity")
+    )
+    claimed = (
+        model.objects.filter(
+            is_claimed=True, claimed_by__isnull=False
+        )
+        .annotate(day=TruncDate(Coalesce("claimed_at", "created_at")))
+        .values("claimed_by_id", "day")
+        .annotate(count=Count("id"), quantity=Sum("quantity"))
+        .values_list("claimed_by_id", "day", "count", "quantity")
+    )
+    return ("donor", donated), ("receiver", claimed)
+
+
+@transaction.atomic
+def backfill(batch_size=1000):
+    """Rebuild every bucket from the donations and archive tables;
+    returns the number of buckets written"""
+    ImpactBucket.objects.all().delete()
+    for role, rows in _bucket_rows(Donation):
+        rows = rows.iterator(chunk_size=batch_size)
+        while chunk := list(islice(rows, batch_size)):
+            ImpactBucket.objects.bulk_create(
+                ImpactBucket(
+                    user_id=user_id,
+                    role=role,
+                    day=day,
+                    count=count,
+                    quantity=quantity,
+                )
+                for user_id, day, count, quantity in chunk
+            )
+    # Archived donations may share a day with live ones: add them
+    for role, rows in _bucket_rows(ArchivedDonation):
+        rows = rows.iterator(chunk_size=batch_size)
+        while chunk := list(islice(rows, batch_size)):
+            apply(
+                {
+                    (user_id, role, day): Counter(
+                        count=count, quantity=quantity
+                    )
+                    for user_id, day, count, quantity in chunk
+                }
+            )
+    return ImpactBucket.objects.count()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core.allocation import allocate
+
+
+class Command(BaseCommand):
+    help = "Allocate open donations to receivers' demand in one batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Compute the allocation without claiming anything",
+        )
+
+    def handle(self, *args, **options):
+        result = allocate(dry_run=options["dry_run"])
+        if result is None:
+            self.stdout.write(
+                self.style.WARNING(
+                    'ALLOCATION["ENABLED"] is off; nothing allocated'
+                )
+            )
+            return
+        verb = "Would allocate" if options["dry_run"] else "Allocated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result.allocated} of {result.donations} "
+                f"donations ({result.quantity} units) to "
+                f"{result.receivers} receivers across "
+                f"{result.demands} open demands"
+            )
+        )
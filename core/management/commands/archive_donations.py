@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archive import archive
+
+
+class Command(BaseCommand):
+    help = "Move old claimed and expired donations to the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ARCHIVE["BATCH_SIZE"],
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count eligible donations without moving them",
+        )
+
+    def handle(self, *args, **options):
+        moved = archive(options["batch_size"], options["dry_run"])
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {moved} donations")
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.leaderboard import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily impact buckets behind the leaderboard"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = backfill(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} impact buckets")
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import encoding, scenarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare encode time and size of the largest responses as "
+        "JSON, ORJSON and MessagePack, plain and compressed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeats", type=int, default=5)
+        parser.add_argument(
+            "--output", help="Write the JSON report to this file"
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            "endpoints": encoding.run(
+                scenarios.BenchmarkContext(), options["repeats"]
+            ),
+        }
+        output = scenarios.dumps(report)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote {options['output']}")
+            )
+        else:
+            self.stdout.write(output)
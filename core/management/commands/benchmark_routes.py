@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import routing, scenarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the pickup route planner on synthetic stops and report "
+        "latency percentiles and distance saved as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10, 50, 100, 200],
+            help="Stops per route",
+        )
+        parser.add_argument("--repeats", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", help="Write the JSON report to this file"
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            "seed": options["seed"],
+            "sizes": routing.run(
+                options["sizes"], options["repeats"], options["seed"]
+            ),
+        }
+        output = scenarios.dumps(report)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote {options['output']}")
+            )
+        else:
+            self.stdout.write(output)
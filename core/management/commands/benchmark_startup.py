@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import scenarios, startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Time cold starts of a web worker in the full and API-only "
+        "profiles, with and without warmup, and report the slowest "
+        "imports as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeats", type=int, default=10)
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="Slowest top-level packages to list",
+        )
+        parser.add_argument(
+            "--output", help="Write the JSON report to this file"
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            "profiles": startup.run(
+                options["repeats"], options["top"]
+            ),
+        }
+        output = scenarios.dumps(report)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote {options['output']}")
+            )
+        else:
+            self.stdout.write(output)
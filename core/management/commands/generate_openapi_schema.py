@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import encode, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the OpenAPI schema for the server to load at startup"
+    )
+
+    def handle(self, *args, **options):
+        schema = encode(generate())
+        path = settings.OPENAPI["PATH"]
+        path.write_bytes(schema.content)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {path} ({schema.digest})")
+        )
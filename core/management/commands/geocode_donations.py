@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.geocoding import geocode_missing_donations
+
+
+class Command(BaseCommand):
+    help = "Geocode donations that have a location but no coordinates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--limit", type=int, help="Stop after this many donations"
+        )
+
+    def handle(self, *args, **options):
+        updated = geocode_missing_donations(
+            batch_size=options["batch_size"], limit=options["limit"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Geocoded {updated} donations")
+        )
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importing import Checkpoint, DonationImporter, iter_records
+
+
+class Command(BaseCommand):
+    help = "Bulk import donations from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Input format (default: from the file extension)",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--checkpoint",
+            help="Progress file used to resume (default: PATH.checkpoint)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any existing checkpoint and start over",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate only; nothing is written",
+        )
+        parser.add_argument(
+            "--geocode",
+            action="store_true",
+            help="Fill missing coordinates from the geocoding cache",
+        )
+        parser.add_argument(
+            "--show-errors",
+            type=int,
+            default=20,
+            help="How many invalid rows to list",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(
+            options["checkpoint"] or f"{options['path']}.checkpoint"
+        )
+        if options["restart"]:
+            checkpoint.clear()
+        importer = DonationImporter(
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            geocode=options["geocode"],
+        )
+
+        start = time.perf_counter()
+        try:
+            importer.run(
+                iter_records(options["path"], options["format"]),
+                checkpoint=checkpoint,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - start
+        if not options["dry_run"]:
+            checkpoint.clear()
+
+        for index, message in importer.errors[
+            : options["show_errors"]
+        ]:
+            self.stderr.write(f"record {index}: {message}")
+        rate = importer.imported / elapsed if elapsed else 0
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {importer.imported} donations in "
+                f"{elapsed:.1f}s ({rate:.0f} rows/s), "
+                f"{len(importer.errors)} rejected"
+            )
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.deletion import purge_donations
+
+
+class Command(BaseCommand):
+    help = "Remove soft-deleted donations and release their images"
+
+    def handle(self, *args, **options):
+        purged = purge_donations()
+        self.stdout.write(
+            self.style.SUCCESS(f"Purged {purged} deleted donations")
+        )
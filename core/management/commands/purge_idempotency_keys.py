@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records"
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} expired keys")
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the donation counters stored on user profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Corrected {fixed} profiles")
+        )
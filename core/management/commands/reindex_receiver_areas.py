@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.notifications import reindex_areas
+
+
+class Command(BaseCommand):
+    help = "Rebuild the grid index of receiver areas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = reindex_areas(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {written} area cells")
+        )
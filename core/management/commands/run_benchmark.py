@@ -0,0 +1,106 @@
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmarks import scenarios
+from core.models import Donation
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Run benchmark scenarios against seeded data and report "
+        "latency percentiles, throughput and query counts as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help="Scenarios to run (default: all of %s)"
+            % ", ".join(scenarios.SCENARIOS),
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per scenario",
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server instead of the test client",
+        )
+        parser.add_argument("--label", default="")
+        parser.add_argument(
+            "--output", help="Write the JSON report to this file"
+        )
+
+    def handle(self, *args, **options):
+        names = options["scenarios"] or list(scenarios.SCENARIOS)
+        unknown = set(names) - set(scenarios.SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f"Unknown scenarios: {', '.join(sorted(unknown))}"
+            )
+        # Debug cursors and query inspection would skew the numbers,
+        # and rate limiting would time 429s instead of the endpoints.
+        # Only in-process: a server given with --url keeps its own
+        inspection = {**settings.QUERY_INSPECTION, "ENABLED": False}
+        throttling = {**settings.THROTTLING, "ENABLED": False}
+        with override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=["localhost"],
+            QUERY_INSPECTION=inspection,
+            THROTTLING=throttling,
+        ):
+            try:
+                context = scenarios.BenchmarkContext(
+                    seed=options["seed"],
+                    base_url=options["url"],
+                    concurrency=options["concurrency"],
+                )
+            except RuntimeError as error:
+                raise CommandError(error)
+            results = scenarios.run(
+                context, names, options["requests"]
+            )
+
+        report = {
+            "label": options["label"],
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "seed": options["seed"],
+            "transport": options["url"] or "test-client",
+            "dataset": {
+                "donations": Donation.objects.count(),
+                "users": User.objects.count(),
+            },
+            "scenarios": results,
+        }
+        output = scenarios.dumps(report)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote {options['output']}")
+            )
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,142 @@
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks"
+
+    def add_arguments(self, parser):
+        config = settings.TASK_QUEUE
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=config["WORKERS"],
+            help="Pool processes; 0 runs tasks in this process",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=config["POLL_INTERVAL"],
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no task is due",
+        )
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}-{os.getpid()}"
+        requeued = tasks.requeue_stale()
+        purged = tasks.purge_finished()
+        if requeued or purged:
+            self.stdout.write(
+                f"Requeued {requeued} stale and purged {purged} "
+                "finished tasks"
+            )
+        if options["workers"]:
+            ran = self.run_pool(worker, options)
+        else:
+            ran = self.run_inline(worker, options)
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} tasks"))
+
+    def run_inline(self, worker, options):
+        ran = 0
+        while True:
+            claimed = tasks.claim(1, worker)
+            if not claimed:
+                if options["burst"]:
+                    return ran
+                time.sleep(options["poll_interval"])
+                continue
+            (queued,) = claimed
+            try:
+                tasks.execute(queued.name, queued.payload)
+            except Exception:
+                tasks.finish(queued, traceback.format_exc())
+            else:
+                tasks.finish(queued)
+            ran += 1
+
+    def new_pool(self, options):
+        # spawn, not fork: a forked child would share this process's
+        # database connection
+        return ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=get_context("spawn"),
+            initializer=tasks.initialize_pool_process,
+        )
+
+    def run_pool(self, worker, options):
+        pool = self.new_pool(options)
+        running = {}
+        ran = 0
+        try:
+            while True:
+                free = options["workers"] - len(running)
+                claimed = tasks.claim(free, worker) if free else []
+                restarted = False
+                for index, queued in enumerate(claimed):
+                    try:
+                        future = pool.submit(
+                            tasks.execute_in_pool,
+                            queued.name,
+                            queued.payload,
+                        )
+                    except BrokenProcessPool:
+                        # A pool process died (OOM, segfault); the
+                        # tasks it had failed below as attempts. Put
+                        # these back and carry on with a new pool
+                        tasks.release(claimed[index:])
+                        self.stderr.write(
+                            "A pool process died; starting a new pool"
+                        )
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = self.new_pool(options)
+                        restarted = True
+                        break
+                    running[future] = queued
+                if restarted:
+                    continue
+                if not running:
+                    if options["burst"]:
+                        return ran
+                    time.sleep(options["poll_interval"])
+                    continue
+                done, _ = wait(
+                    running,
+                    timeout=options["poll_interval"],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    queued = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        tasks.finish(queued)
+                    else:
+                        # A dead process fails every task in flight
+                        # with BrokenProcessPool; each counts as an
+                        # attempt, so a task that keeps killing its
+                        # process ends up failed for good
+                        tasks.finish(
+                            queued,
+                            "".join(
+                                traceback.format_exception(error)
+                            ),
+                        )
+                    ran += 1
+        finally:
+            pool.shutdown()
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import data
+
+
+class Command(BaseCommand):
+    help = "Generate seeded, geographically clustered benchmark data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--donations", type=int, default=10000)
+        parser.add_argument("--donors", type=int, default=500)
+        parser.add_argument("--receivers", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete existing benchmark users and donations first",
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            data.reset()
+        start = time.perf_counter()
+        data.seed(
+            options["donations"],
+            options["donors"],
+            options["receivers"],
+            seed=options["seed"],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {options['donations']} donations, "
+                f"{options['donors']} donors and "
+                f"{options['receivers']} receivers in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,203 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (
+    1024,
+    4 * 1024,
+    16 * 1024,
+    64 * 1024,
+    256 * 1024,
+    1024 * 1024,
+    4 * 1024 * 1024,
+    16 * 1024 * 1024,
+)
+
+HISTOGRAMS = {
+    "request_seconds": (
+        "Wall time from middleware entry to response",
+        LATENCY_BUCKETS,
+    ),
+    "db_queries": ("SQL statements executed", QUERY_COUNT_BUCKETS),
+    "db_seconds": ("Time spent executing SQL", LATENCY_BUCKETS),
+    "render_seconds": (
+        "Time spent rendering the response",
+        LATENCY_BUCKETS,
+    ),
+    "phase_seconds": (
+        "Time spent in named view phases",
+        LATENCY_BUCKETS,
+    ),
+    "response_bytes": ("Response body size", SIZE_BUCKETS),
+}
+
+_phases = ContextVar("metrics_phases", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(
+            self.buckets + ("+Inf",), self.counts
+        ):
+            running += count
+            yield bound, running
+
+
+class MetricsRegistry:
+    """Histograms and counters shared by all threads of a process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(HISTOGRAMS[name][1])
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """Summary per histogram and counter, for the JSON endpoint"""
+        with self._lock:
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "buckets": {
+                        str(bound): count
+                        for bound, count in histogram.cumulative()
+                    },
+                }
+                for (name, labels), histogram in sorted(
+                    self._histograms.items()
+                )
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(
+                    self._counters.items()
+                )
+            ]
+        return {"histograms": histograms, "counters": counters}
+
+    def render_prometheus(self, prefix="foodbridge"):
+        """Text exposition format 0.0.4"""
+        snapshot = self.snapshot()
+        lines = []
+        described = set()
+        for entry in snapshot["histograms"]:
+            metric = f"{prefix}_{entry['name']}"
+            if metric not in described:
+                described.add(metric)
+                lines.append(
+                    f"# HELP {metric} {HISTOGRAMS[entry['name']][0]}"
+                )
+                lines.append(f"# TYPE {metric} histogram")
+            labels = entry["labels"]
+            for bound, count in entry["buckets"].items():
+                lines.append(
+                    f"{metric}_bucket{_labels(labels, le=bound)} {count}"
+                )
+            lines.append(
+                f"{metric}_sum{_labels(labels)} {entry['sum']}"
+            )
+            lines.append(
+                f"{metric}_count{_labels(labels)} {entry['count']}"
+            )
+        for entry in snapshot["counters"]:
+            metric = f"{prefix}_{entry['name']}_total"
+            if metric not in described:
+                described.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(
+                f"{metric}{_labels(entry['labels'])} {entry['value']}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    rendered = ",".join(
+        '{}="{}"'.format(key, str(value).replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + rendered + "}"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def collect_phases():
+    """Collect ``phase`` timings made while the block runs"""
+    phases = {}
+    token = _phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _phases.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Time a named part of a view, e.g. clustering or serialization
+
+    Does nothing unless the request is being sampled.
+    """
+    phases = _phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = (
+            phases.get(name, 0) + time.perf_counter() - start
+        )
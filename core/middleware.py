@@ -0,0 +1,215 @@
+import random
+import re
+import time
+import zlib
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    """Records latency, SQL, render time and payload size per route"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.REQUEST_METRICS
+        if (
+            not config["ENABLED"]
+            or random.random() >= config["SAMPLE_RATE"]
+        ):
+            return self.get_response(request)
+
+        request._metrics_sampled = True
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timer)
+                )
+            phases = stack.enter_context(metrics.collect_phases())
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.view_name if match else "unresolved"
+        metrics.registry.increment(
+            "requests",
+            route=route,
+            method=request.method,
+            status=response.status_code,
+        )
+        metrics.registry.observe(
+            "request_seconds", elapsed, route=route
+        )
+        metrics.registry.observe(
+            "db_queries", timer.count, route=route
+        )
+        metrics.registry.observe(
+            "db_seconds", timer.seconds, route=route
+        )
+        if hasattr(request, "_metrics_render_seconds"):
+            metrics.registry.observe(
+                "render_seconds",
+                request._metrics_render_seconds,
+                route=route,
+            )
+        for name, seconds in phases.items():
+            metrics.registry.observe(
+                "phase_seconds", seconds, route=route, phase=name
+            )
+        if not response.streaming:
+            metrics.registry.observe(
+                "response_bytes", len(response.content), route=route
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        if getattr(request, "_metrics_sampled", False):
+            start = time.perf_counter()
+
+            def rendered(response):
+                request._metrics_render_seconds = (
+                    time.perf_counter() - start
+                )
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        match = re.search(r"q=([0-9.]+)", params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            continue
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def _compressor(coding, streaming=False):
+    """``(compress, finish)`` functions of an incremental encoder;
+    when ``streaming``, each compress call flushes what it was given
+    so every chunk reaches the client as soon as it is produced"""
+    config = settings.COMPRESSION
+    if coding == "br":
+        encoder = brotli.Compressor(quality=config["BROTLI_QUALITY"])
+        if streaming:
+            return (
+                lambda data: encoder.process(data) + encoder.flush()
+            ), encoder.finish
+        return encoder.process, encoder.finish
+    # wbits 31: zlib's deflate with a gzip header and trailer
+    encoder = zlib.compressobj(
+        config["GZIP_LEVEL"], zlib.DEFLATED, 31
+    )
+    if streaming:
+        return (
+            lambda data: encoder.compress(data)
+            + encoder.flush(zlib.Z_SYNC_FLUSH)
+        ), encoder.flush
+    return encoder.compress, encoder.flush
+
+
+def _compress_stream(chunks, coding):
+    compress, finish = _compressor(coding, streaming=True)
+    for chunk in chunks:
+        yield compress(chunk)
+    yield finish()
+
+
+class CompressionMiddleware:
+    """Brotli or gzip for textual responses of at least MIN_SIZE bytes
+
+    Django's GZipMiddleware compresses anything over 200 bytes and
+    knows no brotli. Here small bodies, where the headers outweigh the
+    saving, go out as they are, images and other already compressed
+    types are never touched, and streaming responses are compressed
+    chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        config = settings.COMPRESSION
+        if not config["ENABLED"] or response.has_header(
+            "Content-Encoding"
+        ):
+            return response
+        content_type = response.get("Content-Type", "").split(";")[0]
+        if not content_type.startswith(config["CONTENT_TYPES"]):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = self.choose(request)
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = _compress_stream(
+                response.streaming_content, coding
+            )
+            del response.headers["Content-Length"]
+        else:
+            if len(response.content) < config["MIN_SIZE"]:
+                return response
+            compress, finish = _compressor(coding)
+            content = compress(response.content) + finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+        # The bytes differ from the uncompressed ones'
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = coding
+        return response
+
+    def choose(self, request):
+        accepted = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        offered = ["br", "gzip"] if brotli else ["gzip"]
+        best = max(
+            offered,
+            key=lambda coding: (
+                accepted.get(coding, accepted.get("*", 0)),
+                -offered.index(coding),
+            ),
+        )
+        if accepted.get(best, accepted.get("*", 0)) > 0:
+            return best
+        return None
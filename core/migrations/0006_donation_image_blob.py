@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:33
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_images(apps, schema_editor):
+    Donation = apps.get_model("core", "Donation")
+    ImageBlob = apps.get_model("core", "ImageBlob")
+    references = (
+        Donation.objects.exclude(image="")
+        .exclude(image__isnull=True)
+        .values("image")
+        .annotate(refcount=Count("id"))
+    )
+    ImageBlob.objects.bulk_create(
+        ImageBlob(name=row["image"], refcount=row["refcount"])
+        for row in references
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_donation_image_alter_donation_description"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("refcount", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="donation",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=core.storage.ContentAddressedStorage(),
+                upload_to="donations/",
+            ),
+        ),
+        migrations.RunPython(
+            count_existing_images, migrations.RunPython.noop
+        ),
+    ]
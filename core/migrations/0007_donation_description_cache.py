@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+from core.text import excerpt, html_to_text, sanitize_html
+
+
+def render_descriptions(apps, schema_editor):
+    Donation = apps.get_model("core", "Donation")
+    donations = list(Donation.objects.only("id", "description"))
+    for donation in donations:
+        donation.description_html = sanitize_html(donation.description)
+        donation.description_text = html_to_text(donation.description)
+        donation.description_excerpt = excerpt(donation.description_text)
+    Donation.objects.bulk_update(
+        donations,
+        ["description_html", "description_text", "description_excerpt"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_donation_image_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="donation",
+            name="description_excerpt",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="donation",
+            name="description_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="donation",
+            name="description_text",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(
+            render_descriptions, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:51
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def count_donations(apps, schema_editor):
+    Donation = apps.get_model("core", "Donation")
+    Profile = apps.get_model("core", "Profile")
+    donated = {
+        row["donor_id"]: row
+        for row in Donation.objects.values("donor_id").annotate(
+            made=Count("id"),
+            active=Count("id", filter=Q(is_claimed=False)),
+            last=Max("created_at"),
+        )
+    }
+    claimed = dict(
+        Donation.objects.filter(is_claimed=True, claimed_by__isnull=False)
+        .values("claimed_by_id")
+        .annotate(count=Count("id"))
+        .values_list("claimed_by_id", "count")
+    )
+    profiles = list(Profile.objects.all())
+    for profile in profiles:
+        row = donated.get(profile.user_id, {})
+        profile.donations_made = row.get("made", 0)
+        profile.active_donations = row.get("active", 0)
+        profile.last_donation_at = row.get("last")
+        profile.claims_made = claimed.get(profile.user_id, 0)
+    Profile.objects.bulk_update(
+        profiles,
+        ["donations_made", "active_donations", "claims_made", "last_donation_at"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_geocode_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="active_donations",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="claims_made",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="donations_made",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="last_donation_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(count_donations, migrations.RunPython.noop),
+    ]
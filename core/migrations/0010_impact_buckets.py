@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def stamp_existing_claims(apps, schema_editor):
+    # The claim time was never stored; posting time is the best guess
+    Donation = apps.get_model("core", "Donation")
+    Donation.objects.filter(is_claimed=True).update(claimed_at=F("created_at"))
+
+
+def fill_impact_buckets(apps, schema_editor):
+    # Same totals as leaderboard.backfill, over the donations so far
+    Donation = apps.get_model("core", "Donation")
+    ImpactBucket = apps.get_model("core", "ImpactBucket")
+    donated = (
+        Donation.objects.annotate(day=TruncDate("created_at"))
+        .values("donor_id", "day")
+        .annotate(count=Count("id"), quantity=Sum("quantity"))
+        .values_list("donor_id", "day", "count", "quantity")
+    )
+    claimed = (
+        Donation.objects.filter(is_claimed=True, claimed_by__isnull=False)
+        .annotate(day=TruncDate("claimed_at"))
+        .values("claimed_by_id", "day")
+        .annotate(count=Count("id"), quantity=Sum("quantity"))
+        .values_list("claimed_by_id", "day", "count", "quantity")
+    )
+    for role, rows in (("donor", donated), ("receiver", claimed)):
+        ImpactBucket.objects.bulk_create(
+            [
+                ImpactBucket(
+                    user_id=user_id,
+                    role=role,
+                    day=day,
+                    count=count,
+                    quantity=quantity,
+                )
+                for user_id, day, count, quantity in rows
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_profile_counters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="donation",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="ImpactBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[("donor", "Donor"), ("receiver", "Receiver")],
+                        max_length=10,
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("count", models.IntegerField(default=0)),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="impact_buckets",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["role", "day"], name="core_impact_role_b9a506_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "role", "day"),
+                        name="impact_bucket_user_role_day",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(stamp_existing_claims, migrations.RunPython.noop),
+        migrations.RunPython(fill_impact_buckets, migrations.RunPython.noop),
+    ]
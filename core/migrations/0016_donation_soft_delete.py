@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_archived_donations"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="donation",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["-created_at"],
+                name="donation_live_created",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["latitude", "longitude"],
+                name="donation_live_location",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="donation_deleted",
+            ),
+        ),
+    ]
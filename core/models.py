@@ -1,6 +1,34 @@
+from collections import namedtuple
+
 from ckeditor.fields import RichTextField
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.storage import donation_image_storage
+from core.text import excerpt, html_to_text, sanitize_html
+
+# The fields that decide which per-user aggregates (profile counters,
+# impact buckets) a donation counts towards
+DonationState = namedtuple(
+    "DonationState",
+    [
+        "donor_id",
+        "is_claimed",
+        "claimed_by_id",
+        "quantity",
+        "created_at",
+        "claimed_at",
+    ],
+)
+
+
+class LiveDonationManager(models.Manager):
+    """Donations that have not been (soft) deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Donation(models.Model):
@@ -9,6 +37,12 @@ class Donation(models.Model):
     )
     title = models.CharField(max_length=100)
     description = RichTextField()
+    # Derived from description on save so reads never re-parse the HTML
+    description_html = models.TextField(blank=True, editable=False)
+    description_text = models.TextField(blank=True, editable=False)
+    description_excerpt = models.CharField(
+        max_length=255, blank=True, editable=False
+    )
     quantity = models.PositiveIntegerField()
     location = models.CharField(max_length=255)
     latitude = models.FloatField(null=True, blank=True)
@@ -16,7 +50,10 @@ class Donation(models.Model):
     food_type = models.CharField(max_length=50, null=True, blank=True)
     expiry_date = models.DateField(null=True, blank=True)
     image = models.ImageField(
-        upload_to="donations/", null=True, blank=True
+        upload_to="donations/",
+        storage=donation_image_storage,
+        null=True,
+        blank=True,
     )
     is_claimed = models.BooleanField(default=False)
     claimed_by = models.ForeignKey(
@@ -26,11 +63,150 @@ class Donation(models.Model):
         blank=True,
         related_name="claims",
     )
+    claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by core.deletion; the row and its image go in a later purge
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveDonationManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        # Partial: only live donations are listed, mapped and searched
+        indexes = [
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="donation_live_created",
+            ),
+            models.Index(
+                fields=["latitude", "longitude"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="donation_live_location",
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="donation_deleted",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image so a replaced one can be released
+        instance._loaded_image = instance.__dict__.get("image")
+        instance._loaded_description = instance.__dict__.get(
+            "description"
+        )
+        # What the per-user aggregates credit this donation with
+        fields = DonationState._fields
+        instance._loaded_state = (
+            DonationState(
+                *(instance.__dict__[name] for name in fields)
+            )
+            if all(name in instance.__dict__ for name in fields)
+            else None
+        )
+        return instance
+
+    def render_description(self):
+        self.description_html = sanitize_html(self.description)
+        self.description_text = html_to_text(self.description)
+        self.description_excerpt = excerpt(self.description_text)
+
+    def state(self):
+        return DonationState(
+            *(getattr(self, name) for name in DonationState._fields)
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self.is_claimed != bool(self.claimed_at):
+            self.claimed_at = (
+                timezone.now() if self.is_claimed else None
+            )
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "claimed_at",
+                }
+                update_fields = kwargs["update_fields"]
+        loaded = getattr(self, "_loaded_description", None)
+        writes_description = (
+            update_fields is None or "description" in update_fields
+        )
+        if self.description != loaded and writes_description:
+            self.render_description()
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "description_html",
+                    "description_text",
+                    "description_excerpt",
+                }
+        super().save(*args, **kwargs)
+        self._loaded_description = self.description
+
+
+class ImageBlobManager(models.Manager):
+    def retain(self, name):
+        """Count one more reference to the stored image ``name``"""
+        if self.filter(name=name).update(refcount=F("refcount") + 1):
+            return
+        try:
+            with transaction.atomic():
+                self.create(name=name, refcount=1)
+        except IntegrityError:
+            self.filter(name=name).update(refcount=F("refcount") + 1)
+
+    def release(self, name, storage):
+        """Drop a reference, deleting the file once nothing uses it"""
+        self.filter(name=name).update(refcount=F("refcount") - 1)
+        if self.filter(name=name, refcount__lte=0).delete()[0]:
+            transaction.on_commit(
+                lambda: self._delete_unused(name, storage)
+            )
+
+    def _delete_unused(self, name, storage):
+        # An upload of the same bytes may have reused the file, which
+        # storage does not rewrite, and retained it since
+        if not self.filter(name=name).exists():
+            storage.delete_with_variants(name)
+
+
+class ImageBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ImageBlobManager()
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+class GeocodeCache(models.Model):
+    # Normalized with core.geocoding.normalize_address
+    address = models.CharField(max_length=255, unique=True)
+    # Both null when the provider could not place the address
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    provider = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.address
+
+    @property
+    def point(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return (self.latitude, self.longitude)
+
 
 class Profile(models.Model):
     ROLE_CHOICES = (
@@ -41,6 +217,251 @@ class Profile(models.Model):
         User, on_delete=models.CASCADE, related_name="profile"
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    # Maintained by core.counters; reconcile_profile_counters rebuilds
+    donations_made = models.IntegerField(default=0)
+    active_donations = models.IntegerField(default=0)
+    claims_made = models.IntegerField(default=0)
+    last_donation_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.username} ({self.role})"
+
+
+class ImpactBucket(models.Model):
+    """One user's donations (as donor) or claims (as receiver) on one
+    day; leaderboards sum these over a window"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="impact_buckets"
+    )
+    role = models.CharField(
+        max_length=10, choices=Profile.ROLE_CHOICES
+    )
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "role", "day"],
+                name="impact_bucket_user_role_day",
+            )
+        ]
+        indexes = [models.Index(fields=["role", "day"])]
+
+
+class TaskQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(status__in=[Task.PENDING, Task.RUNNING])
+
+
+class Task(models.Model):
+    """A queued call to a core.tasks @task function"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    # At most one pending or running task per key
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="task_active_key",
+            )
+        ]
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class ReceiverArea(models.Model):
+    """A circle a receiver wants to hear about new donations in"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="receiver_areas"
+    )
+    name = models.CharField(max_length=100)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    radius_km = models.FloatField()
+    # Lowercased; empty matches every food type
+    food_types = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.user.username})"
+
+
+class AreaCell(models.Model):
+    """A grid cell an area's circle overlaps; maintained by
+    core.notifications.index_area"""
+
+    area = models.ForeignKey(
+        ReceiverArea, on_delete=models.CASCADE, related_name="cells"
+    )
+    x = models.IntegerField()
+    y = models.IntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["x", "y"])]
+
+
+class Notification(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="notifications"
+    )
+    donation = models.ForeignKey(
+        Donation,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+    )
+    area = models.ForeignKey(
+        ReceiverArea, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    distance_km = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "donation"],
+                name="notification_user_donation",
+            )
+        ]
+        indexes = [models.Index(fields=["user", "-created_at"])]
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.donation} for {self.user.username}"
+
+
+class Demand(models.Model):
+    """What a receiver asks for from batch allocation: ``quantity``
+    units of some food types within ``radius_km`` of a point"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="demands"
+    )
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    radius_km = models.FloatField()
+    # Lowercased; empty accepts every food type
+    food_types = models.JSONField(default=list, blank=True)
+    quantity = models.PositiveIntegerField()
+    # Units allocated so far; the demand is met once this reaches
+    # quantity
+    allocated = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["is_active", "user"])]
+
+    def __str__(self):
+        return f"{self.quantity} units for {self.user.username}"
+
+    @property
+    def remaining(self):
+        return max(self.quantity - self.allocated, 0)
+
+
+class IdempotencyRecord(models.Model):
+    """A write request made with an Idempotency-Key, and its response
+    once it has one"""
+
+    # "user:<id>", or "ip:<address>" for unauthenticated requests
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # Null while the original request is still running
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True
+    )
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "key"], name="idempotency_scope_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.key})"
+
+
+class ArchivedDonation(models.Model):
+    """A claimed or expired donation moved out of the hot table by
+    ``archive_donations``; keeps its original id"""
+
+    id = models.BigIntegerField(primary_key=True)
+    donor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_donations",
+    )
+    title = models.CharField(max_length=100)
+    description_text = models.TextField(blank=True)
+    quantity = models.PositiveIntegerField()
+    location = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    food_type = models.CharField(max_length=50, null=True, blank=True)
+    expiry_date = models.DateField(null=True, blank=True)
+    is_claimed = models.BooleanField(default=False)
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_claims",
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-created_at"])]
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return self.title
+
+    def state(self):
+        return DonationState(
+            *(getattr(self, name) for name in DonationState._fields)
+        )
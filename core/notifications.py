@@ -0,0 +1,213 @@
+"""Notifying receivers of new donations inside their saved areas
+
+Each ReceiverArea is indexed under the grid cells its circle overlaps
+(AreaCell). A new donation looks up the single cell it falls in, so
+matching reads only the areas around it whatever the total number of
+receivers, and the exact distance and food type checks run on those
+few. Matches become Notification rows, written in batches by a
+background task and, when NOTIFICATIONS["WEBHOOK_URL"] is set, also
+posted there in batches.
+"""
+
+import json
+import math
+import urllib.request
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import AreaCell, Donation, Notification, ReceiverArea
+from core.tasks import enqueue, task
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance"""
+    lat1, lng1, lat2, lng2 = map(
+        math.radians, (lat1, lng1, lat2, lng2)
+    )
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1)
+        * math.cos(lat2)
+        * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def cell(latitude, longitude):
+    size = settings.NOTIFICATIONS["CELL_DEGREES"]
+    return math.floor(longitude / size), math.floor(latitude / size)
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Every cell the bounding box of a circle touches"""
+    dlat = radius_km / KM_PER_DEGREE
+    # A degree of longitude shrinks away from the equator; size the box
+    # for the circle's edge furthest from it
+    furthest = min(abs(latitude) + dlat, 89.0)
+    dlng = min(
+        radius_km
+        / (KM_PER_DEGREE * math.cos(math.radians(furthest))),
+        180.0,
+    )
+    x0, y0 = cell(latitude - dlat, longitude - dlng)
+    x1, y1 = cell(latitude + dlat, longitude + dlng)
+    return [
+        (x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+    ]
+
+
+def _cells_for(area):
+    if not area.is_active:
+        return []
+    return [
+        AreaCell(area=area, x=x, y=y)
+        for x, y in covering_cells(
+            area.latitude, area.longitude, area.radius_km
+        )
+    ]
+
+
+@transaction.atomic
+def index_area(area):
+    """Replace the cells of one area; inactive areas have none"""
+    AreaCell.objects.filter(area=area).delete()
+    AreaCell.objects.bulk_create(_cells_for(area))
+
+
+@transaction.atomic
+def reindex_areas(batch_size=500):
+    """Rebuild the whole index, e.g. after changing CELL_DEGREES;
+    returns the number of cells written"""
+    AreaCell.objects.all().delete()
+    written = 0
+    cells = []
+    for area in ReceiverArea.objects.filter(is_active=True).iterator(
+        chunk_size=batch_size
+    ):
+        cells.extend(_cells_for(area))
+        if len(cells) >= batch_size:
+            AreaCell.objects.bulk_create(cells)
+            written += len(cells)
+            cells = []
+    AreaCell.objects.bulk_create(cells)
+    return written + len(cells)
+
+
+def matching_areas(donation):
+    """``(area, distance_km)`` for every active area of another user
+    that covers ``donation``, nearest first"""
+    x, y = cell(donation.latitude, donation.longitude)
+    food_type = (donation.food_type or "").strip().lower()
+    candidates = ReceiverArea.objects.filter(
+        cells__x=x, cells__y=y, is_active=True
+    ).exclude(user_id=donation.donor_id)
+    matches = []
+    for area in candidates:
+        if area.food_types and food_type not in area.food_types:
+            continue
+        distance = distance_km(
+            area.latitude,
+            area.longitude,
+            donation.latitude,
+            donation.longitude,
+        )
+        if distance <= area.radius_km:
+            matches.append((area, distance))
+    return sorted(matches, key=lambda match: match[1])
+
+
+@task()
+def notify_receivers(donation_id):
+    """Notify every receiver with an area covering a new donation;
+    returns the number of receivers matched"""
+    donation = Donation.objects.filter(
+        pk=donation_id,
+        is_claimed=False,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).first()
+    if donation is None:
+        return 0
+    # One notification per receiver, from their nearest area
+    nearest = {}
+    for area, distance in matching_areas(donation):
+        nearest.setdefault(area.user_id, (area, distance))
+    config = settings.NOTIFICATIONS
+    user_ids = list(nearest)
+    with transaction.atomic():
+        # Conflicts are notifications a failed earlier attempt wrote
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    user_id=user_id,
+                    donation=donation,
+                    area=area,
+                    distance_km=round(distance, 3),
+                )
+                for user_id, (area, distance) in nearest.items()
+            ],
+            batch_size=config["BATCH_SIZE"],
+            ignore_conflicts=True,
+        )
+        if config["WEBHOOK_URL"]:
+            for offset in range(
+                0, len(user_ids), config["BATCH_SIZE"]
+            ):
+                enqueue(
+                    deliver_webhook,
+                    {
+                        "donation_id": donation_id,
+                        "user_ids": user_ids[
+                            offset : offset + config["BATCH_SIZE"]
+                        ],
+                    },
+                    key=f"webhook:{donation_id}:{offset}",
+                )
+    return len(user_ids)
+
+
+@task()
+def deliver_webhook(donation_id, user_ids):
+    """POST one batch of a donation's notifications to the webhook;
+    an error response raises, so the queue retries the batch"""
+    config = settings.NOTIFICATIONS
+    donation = Donation.objects.get(pk=donation_id)
+    body = {
+        "donation": {
+            "id": donation.pk,
+            "title": donation.title,
+            "food_type": donation.food_type,
+            "quantity": donation.quantity,
+            "location": donation.location,
+            "latitude": donation.latitude,
+            "longitude": donation.longitude,
+        },
+        "receivers": list(
+            Notification.objects.filter(
+                donation_id=donation_id, user_id__in=user_ids
+            ).values("user_id", "area_id", "distance_km")
+        ),
+    }
+    request = urllib.request.Request(
+        config["WEBHOOK_URL"],
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(
+        request, timeout=config["WEBHOOK_TIMEOUT"]
+    ):
+        pass
+
+
+def schedule_donation(donation_id):
+    """Queue matching of one new, located donation"""
+    return enqueue(
+        notify_receivers,
+        {"donation_id": donation_id},
+        key=f"notify:{donation_id}",
+    )
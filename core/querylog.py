@@ -0,0 +1,166 @@
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(
+    r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RepeatedQueryError(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape so repeats can be grouped"""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryInspector:
+    """Captures every statement run while active, grouped by shape"""
+
+    def __init__(self, slow_ms=None):
+        config = settings.QUERY_INSPECTION
+        self.slow_ms = (
+            config["SLOW_QUERY_MS"] if slow_ms is None else slow_ms
+        )
+        self.queries = []
+        self.shapes = {}
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self._record)
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            alias = context["connection"].alias
+            self.queries.append((alias, sql, params, duration))
+            shape = self.shapes.setdefault(
+                normalize_sql(sql), {"count": 0, "ms": 0.0}
+            )
+            shape["count"] += 1
+            shape["ms"] += duration
+
+    def repeated(self, threshold):
+        """Shapes executed more than ``threshold`` times"""
+        return {
+            shape: stats
+            for shape, stats in self.shapes.items()
+            if stats["count"] > threshold
+        }
+
+    def slow(self):
+        return [
+            query
+            for query in self.queries
+            if query[3] >= self.slow_ms
+        ]
+
+    def explain(self, alias, sql, params):
+        """Query plan for a captured SELECT, run after capture ends"""
+        if not sql.lstrip().upper().startswith("SELECT"):
+            return None
+        connection = connections[alias]
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return "\n".join(
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+
+class assert_max_repeats:
+    """Fail a test block that runs any statement shape too often
+
+    with assert_max_repeats(3):
+        client.get("/api/donations/statistics/")
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.inspector = QueryInspector()
+
+    def __enter__(self):
+        self.inspector.__enter__()
+        return self.inspector
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.inspector.__exit__(exc_type, exc, traceback)
+        repeated = self.inspector.repeated(self.threshold)
+        if exc_type is None and repeated:
+            raise RepeatedQueryError(_describe(repeated))
+
+
+def _describe(repeated):
+    return "; ".join(
+        f"{stats['count']}x {shape}"
+        for shape, stats in repeated.items()
+    )
+
+
+class QueryInspectionMiddleware:
+    """Development aid: flags N+1 query patterns and slow statements"""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTION["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.QUERY_INSPECTION
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+
+        response["X-Query-Count"] = len(inspector.queries)
+        path = request.path
+        for alias, sql, params, duration in inspector.slow():
+            plan = (
+                inspector.explain(alias, sql, params)
+                if config["EXPLAIN"]
+                else None
+            )
+            logger.warning(
+                "Slow query on %s (%.1f ms): %s %r\n%s",
+                path,
+                duration,
+                sql,
+                params,
+                plan or "",
+            )
+
+        repeated = inspector.repeated(config["REPEAT_THRESHOLD"])
+        if repeated:
+            message = (
+                f"Repeated queries on {path}: {_describe(repeated)}"
+            )
+            if config["RAISE"]:
+                raise RepeatedQueryError(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,71 @@
+import msgpack
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+# Types neither encoder knows natively (lazy strings, Decimal, UUID,
+# querysets...) are converted the way DRF's own JSON encoder does
+_fallback = JSONEncoder().default
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """Passes through text already in Prometheus exposition format"""
+
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(
+        self, data, accepted_media_type=None, renderer_context=None
+    ):
+        if not isinstance(data, str):
+            # Errors (401, 403, 429...) are dicts: their message as
+            # text, or anything else as JSON
+            detail = (
+                data.get("detail") if isinstance(data, dict) else None
+            )
+            if detail is not None:
+                data = f"{detail}\n"
+            else:
+                data = orjson.dumps(data, default=_fallback).decode()
+        return data.encode(self.charset)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer producing the same documents several times faster"""
+
+    def render(
+        self, data, accepted_media_type=None, renderer_context=None
+    ):
+        if data is None:
+            return b""
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            options |= orjson.OPT_INDENT_2
+        content = orjson.dumps(
+            data, default=_fallback, option=options
+        )
+        # Escaped like JSONRenderer does, for embedding in JavaScript
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Binary MessagePack, for clients sending
+    ``Accept: application/msgpack``; dates are ISO 8601 strings as in
+    JSON"""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(
+        self, data, accepted_media_type=None, renderer_context=None
+    ):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_fallback)
@@ -0,0 +1,113 @@
+"""Sending heavy reads to a read replica
+
+Views decorated with ``replica_reads`` (dashboard and map aggregates)
+run their queries on the REPLICA["ALIAS"] database when one is
+configured, so they stop competing with claims and other writes on the
+primary. Everything else, and every write, stays on the primary.
+
+Replicas lag behind. A user who has just written is pinned to the
+primary for REPLICA["STICKY_SECONDS"], so e.g. the statistics right
+after a claim include it. Pins are kept in a cache shared by all
+worker processes.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Whether the current request reads from the replica, and whether it
+# has written anything
+_reading = ContextVar("replica_reading", default=False)
+_wrote = ContextVar("replica_wrote", default=None)
+
+
+def replica_alias():
+    """The replica's alias, or None when there is none configured"""
+    alias = settings.REPLICA["ALIAS"]
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_key(user):
+    return f"replica-pin:{user.pk}"
+
+
+def is_pinned(user):
+    if not user or not user.is_authenticated:
+        return False
+    cache = caches[settings.REPLICA["CACHE"]]
+    return cache.get(_pin_key(user)) is not None
+
+
+def pin(user):
+    """Keep ``user``'s reads on the primary for STICKY_SECONDS"""
+    config = settings.REPLICA
+    caches[config["CACHE"]].set(
+        _pin_key(user), True, timeout=config["STICKY_SECONDS"]
+    )
+
+
+@contextmanager
+def use_replica(user=None):
+    """Route reads made in the block to the replica, unless there is
+    none or ``user`` has written recently"""
+    if replica_alias() is None or is_pinned(user):
+        yield
+        return
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def replica_reads(method):
+    """Run a view method's reads on the replica"""
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        with use_replica(request.user):
+            return method(self, request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reading.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        if wrote is not None:
+            wrote[0] = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+
+class ReplicaPinMiddleware:
+    """Pins users who wrote during a request to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if replica_alias() is None:
+            return self.get_response(request)
+        wrote = [False]
+        token = _wrote.set(wrote)
+        try:
+            response = self.get_response(request)
+        finally:
+            _wrote.reset(token)
+        # DRF sets the authenticated user back on the request
+        user = getattr(request, "user", None)
+        if wrote[0] and user is not None and user.is_authenticated:
+            pin(user)
+        return response
@@ -0,0 +1,205 @@
+"""Pickup route planning over a receiver's donations
+
+Stops are ordered with a nearest-neighbour tour refined by 2-opt, both
+over a haversine distance matrix computed in one vectorized NumPy pass.
+Expiry dates are deadlines: nearest-neighbour always picks among the
+stops due soonest, and 2-opt only keeps a reversal that shortens the
+route without adding lateness. Routes are open; the driver does not
+return to the start.
+"""
+
+import time
+from collections import namedtuple
+from datetime import datetime, time as day_time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from core.notifications import EARTH_RADIUS_KM
+
+PlannedStop = namedtuple(
+    "PlannedStop", ["key", "leg_km", "arrival", "late"]
+)
+Route = namedtuple("Route", ["stops", "distance_km", "duration"])
+
+
+def distances(
+    latitudes, longitudes, other_latitudes, other_longitudes
+):
+    """Great-circle distances in km from each point of the first set
+    (rows) to each point of the second (columns)"""
+    lat1 = np.radians(np.asarray(latitudes, dtype=float))[:, None]
+    lng1 = np.radians(np.asarray(longitudes, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(other_latitudes, dtype=float))[
+        None, :
+    ]
+    lng2 = np.radians(np.asarray(other_longitudes, dtype=float))[
+        None, :
+    ]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_matrix(latitudes, longitudes):
+    """Pairwise great-circle distances in km"""
+    return distances(latitudes, longitudes, latitudes, longitudes)
+
+
+def expiry_deadline(expiry_date):
+    """The end of the expiry day, local time; None without a date"""
+    if expiry_date is None:
+        return None
+    return timezone.make_aware(
+        datetime.combine(expiry_date, day_time.max)
+    )
+
+
+def arrivals(route, matrix, seconds_per_km, service_seconds):
+    """Seconds from departure until each node after the first of
+    ``route`` is reached, stopping ``service_seconds`` at each"""
+    legs = matrix[route[:-1], route[1:]]
+    return (
+        np.cumsum(legs) * seconds_per_km
+        + np.arange(len(legs)) * service_seconds
+    )
+
+
+def lateness(
+    route, matrix, deadlines, seconds_per_km, service_seconds
+):
+    late = (
+        arrivals(route, matrix, seconds_per_km, service_seconds)
+        - deadlines[route[1:]]
+    )
+    return float(np.maximum(late, 0).sum())
+
+
+def nearest_neighbour(matrix, deadlines):
+    """Tour from node 0 that always moves to the nearest of the
+    unvisited nodes with the soonest deadline"""
+    unvisited = np.ones(len(matrix), dtype=bool)
+    unvisited[0] = False
+    route = [0]
+    for _ in range(len(matrix) - 1):
+        due = np.where(unvisited, deadlines, np.inf)
+        candidates = unvisited & (deadlines == due.min())
+        route.append(
+            int(
+                np.where(
+                    candidates, matrix[route[-1]], np.inf
+                ).argmin()
+            )
+        )
+        unvisited[route[-1]] = False
+    return np.array(route)
+
+
+def two_opt(
+    route, matrix, deadlines, seconds_per_km, service_seconds, until
+):
+    """Reverse segments of ``route`` while that shortens it without
+    making it later, or until the ``until`` perf_counter deadline.
+    The first and last nodes stay in place"""
+    route = route.copy()
+    late = lateness(
+        route, matrix, deadlines, seconds_per_km, service_seconds
+    )
+    improved = True
+    while improved and time.perf_counter() < until:
+        improved = False
+        for i in range(1, len(route) - 2):
+            # Gain of reversing route[i:j + 1] for every j at once
+            j = np.arange(i + 1, len(route) - 1)
+            a, b = route[i - 1], route[i]
+            c, d = route[j], route[j + 1]
+            delta = (
+                matrix[a, c]
+                + matrix[b, d]
+                - matrix[a, b]
+                - matrix[c, d]
+            )
+            for k in np.argsort(delta):
+                if delta[k] >= -1e-9:
+                    break
+                candidate = route.copy()
+                candidate[i : j[k] + 1] = candidate[i : j[k] + 1][
+                    ::-1
+                ]
+                candidate_late = lateness(
+                    candidate,
+                    matrix,
+                    deadlines,
+                    seconds_per_km,
+                    service_seconds,
+                )
+                if candidate_late <= late:
+                    route, late, improved = (
+                        candidate,
+                        candidate_late,
+                        True,
+                    )
+                    break
+            if time.perf_counter() >= until:
+                break
+    return route
+
+
+def plan(start, stops, departure=None):
+    """Order ``stops``, ``(key, latitude, longitude, deadline)`` tuples
+    with an aware datetime or None as deadline, for a driver leaving
+    ``start`` (latitude, longitude) at ``departure``"""
+    config = settings.ROUTING
+    departure = departure or timezone.now()
+    if not stops:
+        return Route([], 0.0, timedelta())
+    until = time.perf_counter() + config["TIME_LIMIT_MS"] / 1000
+    seconds_per_km = 3600 / config["SPEED_KMH"]
+    service_seconds = config["SERVICE_MINUTES"] * 60
+
+    # Node 0 is the start; a last, free-to-reach node turns the open
+    # route into a tour 2-opt can work on with both ends fixed
+    latitudes = [start[0]] + [stop[1] for stop in stops]
+    longitudes = [start[1]] + [stop[2] for stop in stops]
+    size = len(stops) + 1
+    matrix = np.zeros((size + 1, size + 1))
+    matrix[:size, :size] = distance_matrix(latitudes, longitudes)
+    deadlines = np.full(size + 1, np.inf)
+    deadlines[1:size] = [
+        (
+            (stop[3] - departure).total_seconds()
+            if stop[3] is not None
+            else np.inf
+        )
+        for stop in stops
+    ]
+
+    route = nearest_neighbour(matrix[:size, :size], deadlines[:size])
+    route = two_opt(
+        np.append(route, size),
+        matrix,
+        deadlines,
+        seconds_per_km,
+        service_seconds,
+        until,
+    )[:-1]
+
+    legs = matrix[route[:-1], route[1:]]
+    reached = arrivals(route, matrix, seconds_per_km, service_seconds)
+    planned = [
+        PlannedStop(
+            stops[node - 1][0],
+            float(leg),
+            departure + timedelta(seconds=float(seconds)),
+            bool(seconds > deadlines[node]),
+        )
+        for node, leg, seconds in zip(route[1:], legs, reached)
+    ]
+    return Route(
+        planned,
+        float(legs.sum()),
+        timedelta(seconds=float(reached[-1]) + service_seconds),
+    )
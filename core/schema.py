@@ -0,0 +1,59 @@
+"""The OpenAPI schema of the API, generated once and served by hash
+
+Generating the schema walks every route and serializer, about a
+tenth of a second, so it is done once per process (or once at build
+time with ``manage.py generate_openapi_schema``) and kept as canonical
+JSON bytes with their SHA-256. ``/api/schema/`` answers with an ETag
+and points at ``/api/schema/<hash>.json``, whose content can never
+change and is served as immutable.
+"""
+
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from rest_framework.schemas.openapi import SchemaGenerator
+
+Schema = namedtuple("Schema", ["content", "digest"])
+
+_lock = threading.Lock()
+_schema = None
+
+
+def generate():
+    """Build the schema of every ``/api/`` route as a dict"""
+    config = settings.OPENAPI
+    schema = SchemaGenerator(
+        title=config["TITLE"],
+        version=config["VERSION"],
+        description=config["DESCRIPTION"],
+    ).get_schema(request=None, public=True)
+    schema["paths"] = {
+        path: operations
+        for path, operations in schema["paths"].items()
+        if path.startswith("/api/")
+    }
+    return schema
+
+
+def encode(schema):
+    content = json.dumps(
+        schema, sort_keys=True, separators=(",", ":")
+    ).encode()
+    return Schema(content, hashlib.sha256(content).hexdigest()[:16])
+
+
+def get():
+    """The schema, from the prebuilt file when there is one"""
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                path = settings.OPENAPI["PATH"]
+                if path and path.exists():
+                    _schema = encode(json.loads(path.read_bytes()))
+                else:
+                    _schema = encode(generate())
+    return _schema
@@ -1,28 +1,137 @@
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from PIL import Image
 from rest_framework import serializers
 
-from core.models import Donation, Profile
+from core.accounts import (
+    build_user,
+    create_user,
+    provision_users,
+    temporary_password,
+)
+from core.images import normalize_upload, stored_upload, variant_urls
+from core.models import (
+    ArchivedDonation,
+    Demand,
+    Donation,
+    Notification,
+    Profile,
+    ReceiverArea,
+)
+
+
+class ImageHeaderField(serializers.FileField):
+    """Validates an image from its header instead of decoding it"""
+
+    default_error_messages = {
+        "invalid_image": "Upload a valid JPEG, PNG, WebP or AVIF image.",
+        "too_many_pixels": "Images are limited to {max_pixels} pixels.",
+    }
+    formats = ("JPEG", "PNG", "WEBP", "AVIF")
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            # Image.open only parses the header; pixels are not decoded
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            self.fail("invalid_image")
+        if image_format not in self.formats:
+            self.fail("invalid_image")
+        if width * height > settings.DONATION_UPLOAD_MAX_PIXELS:
+            self.fail(
+                "too_many_pixels",
+                max_pixels=settings.DONATION_UPLOAD_MAX_PIXELS,
+            )
+        file.seek(0)
+        return file
 
 
 class DonationSerializer(serializers.ModelSerializer):
     donor_name = serializers.CharField(
         source="donor.username", read_only=True
     )
+    image = ImageHeaderField(
+        required=False, allow_null=True, allow_empty_file=False
+    )
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Donation
-        fields = "__all__"
-        read_only_fields = ["id", "donor", "created_at"]
+        exclude = [
+            "description_html",
+            "description_text",
+            "description_excerpt",
+        ]
+        read_only_fields = [
+            "id",
+            "donor",
+            "created_at",
+            # Set by the server when a donation is claimed
+            "claimed_at",
+            # Only soft_delete() may set it
+            "deleted_at",
+        ]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Serve the sanitized copy rendered at write time
+        if "description" in data:
+            data["description"] = instance.description_html
+        return data
+
+    def _absolute_url(self, url):
+        request = self.context.get("request")
+        if request:
+            return request.build_absolute_uri(url)
+        return url
 
     def get_image_url(self, obj):
         if obj.image:
-            request = self.context.get("request")
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
+            return self._absolute_url(obj.image.url)
         return None
 
+    def get_image_variants(self, obj):
+        if not obj.image:
+            return None
+        return {
+            variant: self._absolute_url(url)
+            for variant, url in variant_urls(obj.image.name).items()
+        }
+
+    def validate_image(self, value):
+        if value:
+            return stored_upload(value) or normalize_upload(value)
+        return value
+
+
+class DonationListSerializer(DonationSerializer):
+    """Compact representation for lists and the map"""
+
+    class Meta(DonationSerializer.Meta):
+        exclude = [
+            "description",
+            "description_html",
+            "description_text",
+        ]
+
+
+class ArchivedDonationSerializer(serializers.ModelSerializer):
+    donor_name = serializers.CharField(
+        source="donor.username", read_only=True
+    )
+
+    class Meta:
+        model = ArchivedDonation
+        fields = "__all__"
+        read_only_fields = [
+            field.name for field in ArchivedDonation._meta.fields
+        ]
+
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -35,24 +144,123 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ["username", "email", "password", "role"]
 
     def create(self, validated_data):
-        role = validated_data.pop("role")
-        user = User.objects.create_user(**validated_data)
-        user.profile.role = role
-        user.profile.save()
-        return user
+        return create_user(**validated_data)
+
+
+class InviteSerializer(serializers.Serializer):
+    username = serializers.CharField(
+        max_length=150, validators=[UnicodeUsernameValidator()]
+    )
+    email = serializers.EmailField(required=False, allow_blank=True)
+    role = serializers.ChoiceField(choices=Profile.ROLE_CHOICES)
+
+
+class BulkInviteSerializer(serializers.Serializer):
+    users = InviteSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.USER_INVITE_MAX_BATCH,
+    )
+
+    def validate_users(self, value):
+        usernames = [
+            User.normalize_username(invite["username"])
+            for invite in value
+        ]
+        duplicates = {
+            username
+            for username in usernames
+            if usernames.count(username) > 1
+        }
+        taken = set(
+            User.objects.filter(username__in=usernames).values_list(
+                "username", flat=True
+            )
+        )
+        if duplicates or taken:
+            raise serializers.ValidationError(
+                "Usernames already in use: "
+                + ", ".join(sorted(duplicates | taken))
+            )
+        return value
+
+    def create(self, validated_data):
+        """Create every invited account in one batch, each with a
+        temporary password returned once in the response"""
+        passwords = {}
+        accounts = []
+        for invite in validated_data["users"]:
+            password = temporary_password()
+            user = build_user(
+                invite["username"],
+                invite.get("email", ""),
+                password,
+                invite["role"],
+            )
+            passwords[user.username] = password
+            accounts.append((user, invite["role"]))
+        users = provision_users(accounts)
+        for user in users:
+            user.temporary_password = passwords[user.username]
+        return users
+
+
+class InvitedUserSerializer(serializers.ModelSerializer):
+    role = serializers.CharField(source="profile.role")
+    temporary_password = serializers.CharField()
+
+    class Meta:
+        model = User
+        fields = [
+            "id",
+            "username",
+            "email",
+            "role",
+            "temporary_password",
+        ]
+        read_only_fields = fields
+
+
+class ProfileCountersMixin(serializers.Serializer):
+    donations_made = serializers.IntegerField(
+        source="profile.donations_made", read_only=True
+    )
+    active_donations = serializers.IntegerField(
+        source="profile.active_donations", read_only=True
+    )
+    claims_made = serializers.IntegerField(
+        source="profile.claims_made", read_only=True
+    )
+    last_donation_at = serializers.DateTimeField(
+        source="profile.last_donation_at", read_only=True
+    )
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(
+    ProfileCountersMixin, serializers.ModelSerializer
+):
     role = serializers.CharField(source="profile.role")
     is_superuser = serializers.BooleanField()
 
     class Meta:
         model = User
-        fields = ["id", "username", "email", "role", "is_superuser"]
+        fields = [
+            "id",
+            "username",
+            "email",
+            "role",
+            "is_superuser",
+            "donations_made",
+            "active_donations",
+            "claims_made",
+            "last_donation_at",
+        ]
         read_only_fields = fields
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(
+    ProfileCountersMixin, serializers.ModelSerializer
+):
     role = serializers.CharField(source="profile.role")
     date_joined = serializers.DateTimeField(
         format="%Y-%m-%dT%H:%M:%S"
@@ -70,6 +278,10 @@ class UserDetailSerializer(serializers.ModelSerializer):
             "role",
             "date_joined",
             "last_login",
+            "donations_made",
+            "active_donations",
+            "claims_made",
+            "last_donation_at",
         ]
         read_only_fields = fields
 
@@ -79,3 +291,133 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         model = User
         fields = ["username", "email"]
         read_only_fields = ["id"]
+
+
+class CircleSerializerMixin(serializers.Serializer):
+    """Validation for a point, radius and food types filter"""
+
+    food_types = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        required=False,
+        max_length=20,
+    )
+
+    def max_radius_km(self):
+        return settings.NOTIFICATIONS["MAX_RADIUS_KM"]
+
+    def validate_latitude(self, value):
+        if not -90 <= value <= 90:
+            raise serializers.ValidationError(
+                "Latitude must be between -90 and 90."
+            )
+        return value
+
+    def validate_longitude(self, value):
+        if not -180 <= value <= 180:
+            raise serializers.ValidationError(
+                "Longitude must be between -180 and 180."
+            )
+        return value
+
+    def validate_radius_km(self, value):
+        max_radius = self.max_radius_km()
+        if not 0 < value <= max_radius:
+            raise serializers.ValidationError(
+                f"Radius must be more than 0 and at most {max_radius} km."
+            )
+        return value
+
+    def validate_food_types(self, value):
+        # Matched case-insensitively against Donation.food_type
+        return sorted(
+            {food_type.strip().lower() for food_type in value}
+        )
+
+
+class ReceiverAreaSerializer(
+    CircleSerializerMixin, serializers.ModelSerializer
+):
+    class Meta:
+        model = ReceiverArea
+        fields = [
+            "id",
+            "name",
+            "latitude",
+            "longitude",
+            "radius_km",
+            "food_types",
+            "is_active",
+            "created_at",
+        ]
+        read_only_fields = ["id", "created_at"]
+
+    def validate(self, attrs):
+        if self.instance is None:
+            limit = settings.NOTIFICATIONS["MAX_AREAS_PER_USER"]
+            user = self.context["request"].user
+            if user.receiver_areas.count() >= limit:
+                raise serializers.ValidationError(
+                    f"You can save at most {limit} areas."
+                )
+        return attrs
+
+
+class DemandSerializer(
+    CircleSerializerMixin, serializers.ModelSerializer
+):
+    class Meta:
+        model = Demand
+        fields = [
+            "id",
+            "latitude",
+            "longitude",
+            "radius_km",
+            "food_types",
+            "quantity",
+            "allocated",
+            "remaining",
+            "is_active",
+            "created_at",
+        ]
+        read_only_fields = [
+            "id",
+            "allocated",
+            "remaining",
+            "created_at",
+        ]
+
+    def max_radius_km(self):
+        return settings.ALLOCATION["MAX_RADIUS_KM"]
+
+    def validate_quantity(self, value):
+        if value < 1:
+            raise serializers.ValidationError(
+                "Quantity must be at least 1."
+            )
+        return value
+
+    def validate(self, attrs):
+        if self.instance is None:
+            limit = settings.ALLOCATION["MAX_DEMANDS_PER_USER"]
+            user = self.context["request"].user
+            if user.demands.filter(is_active=True).count() >= limit:
+                raise serializers.ValidationError(
+                    f"You can have at most {limit} active demands."
+                )
+        return attrs
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    donation = DonationListSerializer(read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = [
+            "id",
+            "donation",
+            "area",
+            "distance_km",
+            "created_at",
+            "read_at",
+        ]
+        read_only_fields = fields
@@ -1,11 +1,63 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Profile
+from . import archive, counters, notifications
+from .models import Donation, ImageBlob, Profile, ReceiverArea
 
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Donation)
+def track_image_reference(sender, instance, raw, **kwargs):
+    previous = getattr(instance, "_loaded_image", None) or None
+    current = instance.image.name or None
+    if raw or previous == current:
+        return
+    if current:
+        ImageBlob.objects.retain(current)
+    if previous:
+        ImageBlob.objects.release(previous, instance.image.storage)
+    instance._loaded_image = current
+
+
+@receiver(post_delete, sender=Donation)
+def release_image_reference(sender, instance, **kwargs):
+    if instance.image:
+        ImageBlob.objects.release(
+            instance.image.name, instance.image.storage
+        )
+
+
+@receiver(post_save, sender=Donation)
+def count_donation(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    current = instance.state()
+    if created:
+        counters.record(None, current)
+    else:
+        loaded = getattr(instance, "_loaded_state", None)
+        # Unknown for instances not loaded in full; reconcile covers it
+        if loaded is not None and loaded != current:
+            counters.record(loaded, current)
+    instance._loaded_state = current
+
+
+@receiver(post_delete, sender=Donation)
+def uncount_donation(sender, instance, **kwargs):
+    # Archived donations keep counting; the archive holds them now.
+    # Soft-deleted ones stopped counting when they were deleted
+    if instance.deleted_at is None and not archive.is_archiving():
+        counters.record(instance.state(), None)
+
+
+@receiver(post_save, sender=ReceiverArea)
+def index_receiver_area(sender, instance, raw, **kwargs):
+    # Fixtures are loaded raw; reindex_receiver_areas covers them
+    if not raw:
+        notifications.index_area(instance)
@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each unique file once, named after its SHA-256 digest"""
+
+    def content_hash(self, content):
+        digest = getattr(content, "content_hash", None)
+        if digest:
+            return digest
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def hashed_name(self, name, digest):
+        """Where content with ``digest`` uploaded as ``name`` is kept"""
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], f"{digest}{extension}"
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.hashed_name(name, self.content_hash(content))
+        return super().save(name, content, max_length)
+
+    def save_exact(self, name, content):
+        """Store ``content`` under ``name`` without content addressing"""
+        return super().save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so there is nothing to avoid
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def delete_with_variants(self, name):
+        """Delete ``name`` and the variants generated from it"""
+        from core.images import variant_name
+
+        # Exact names only: a legacy name such as donations/bread.jpg
+        # shares its stem with Django's collision-suffixed siblings
+        for variant in settings.DONATION_IMAGE_VARIANTS:
+            self.delete(variant_name(name, variant))
+        self.delete(name)
+
+
+donation_image_storage = ContentAddressedStorage()
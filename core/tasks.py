@@ -0,0 +1,237 @@
+"""Database-backed background tasks
+
+Functions decorated with ``@task`` can be queued with ``enqueue``;
+the row is written in the caller's transaction, so a task never runs
+for a write that rolled back. ``manage.py run_tasks`` claims due rows
+and runs them in a process pool, retrying failures with exponential
+backoff. Payloads are JSON keyword arguments.
+"""
+
+import logging
+import os
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import (
+    IntegrityError,
+    close_old_connections,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Models are imported inside functions: pool processes import this
+# module before django.setup() has run
+_registry = {}
+
+
+def task(max_attempts=None):
+    """Register a function as a task; it can still be called directly"""
+
+    def decorator(function):
+        function.task_name = (
+            f"{function.__module__}.{function.__name__}"
+        )
+        function.max_attempts = max_attempts
+        _registry[function.task_name] = function
+        return function
+
+    return decorator
+
+
+def get_task(name):
+    if name not in _registry:
+        # Importing the defining module runs its @task decorators
+        import_module(name.rpartition(".")[0])
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"No task named '{name}'")
+
+
+def enqueue(function, kwargs=None, key=None, delay=None):
+    """Queue ``function(**kwargs)``; with ``key``, returns the task
+    already pending or running under that key instead of adding one"""
+    from core.models import Task
+
+    config = settings.TASK_QUEUE
+    fields = {
+        "name": function.task_name,
+        "payload": kwargs or {},
+        "key": key,
+        "max_attempts": function.max_attempts
+        or config["MAX_ATTEMPTS"],
+        "run_after": timezone.now() + (delay or timedelta()),
+    }
+    if key:
+        existing = Task.objects.active().filter(key=key).first()
+        if existing:
+            return existing
+    try:
+        with transaction.atomic():
+            queued = Task.objects.create(**fields)
+    except IntegrityError:
+        # Lost a race with another enqueue of the same key
+        return Task.objects.active().get(key=key)
+    if config["EAGER"]:
+        transaction.on_commit(lambda: run_inline(queued.pk))
+    return queued
+
+
+def backoff(attempts):
+    config = settings.TASK_QUEUE
+    seconds = config["RETRY_BACKOFF"] * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, config["MAX_BACKOFF"]))
+
+
+def claim(limit, worker):
+    """Mark up to ``limit`` due tasks as running for ``worker``"""
+    from core.models import Task
+
+    now = timezone.now()
+    candidates = (
+        Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[: limit * 2]
+    )
+    claimed = []
+    for pk in candidates:
+        # Conditional update: another worker may have taken it first
+        if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        ):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Task.objects.filter(pk__in=claimed).order_by("id"))
+
+
+def finish(queued, error=None):
+    """Record the outcome of a claimed task, scheduling a retry when
+    attempts remain"""
+    from core.models import Task
+
+    now = timezone.now()
+    if error is None:
+        queued.status = Task.DONE
+        queued.finished_at = now
+        queued.last_error = ""
+    elif queued.attempts < queued.max_attempts:
+        queued.status = Task.PENDING
+        queued.run_after = now + backoff(queued.attempts)
+        queued.last_error = error
+        logger.warning(
+            "Task %s (%s) failed, retrying: %s",
+            queued.pk,
+            queued.name,
+            error.strip().splitlines()[-1],
+        )
+    else:
+        queued.status = Task.FAILED
+        queued.finished_at = now
+        queued.last_error = error
+        logger.error(
+            "Task %s (%s) failed for good:\n%s",
+            queued.pk,
+            queued.name,
+            error,
+        )
+    queued.locked_by = ""
+    queued.locked_at = None
+    queued.save(
+        update_fields=[
+            "status",
+            "run_after",
+            "finished_at",
+            "last_error",
+            "locked_by",
+            "locked_at",
+        ]
+    )
+
+
+def release(queued):
+    """Return claimed tasks that never started to the queue, without
+    counting the attempt"""
+    from core.models import Task
+
+    Task.objects.filter(
+        pk__in=[task.pk for task in queued], status=Task.RUNNING
+    ).update(
+        status=Task.PENDING,
+        locked_by="",
+        locked_at=None,
+        attempts=F("attempts") - 1,
+    )
+
+
+def execute(name, payload):
+    get_task(name)(**payload)
+
+
+def execute_in_pool(name, payload):
+    """Pool process entry point; connections are closed between tasks
+    as a request would"""
+    try:
+        execute(name, payload)
+    finally:
+        close_old_connections()
+
+
+def run_inline(pk, worker=None):
+    """Claim and run one task in this process"""
+    from core.models import Task
+
+    now = timezone.now()
+    if not Task.objects.filter(pk=pk, status=Task.PENDING).update(
+        status=Task.RUNNING,
+        locked_by=worker or f"inline-{os.getpid()}",
+        locked_at=now,
+        attempts=F("attempts") + 1,
+    ):
+        return
+    queued = Task.objects.get(pk=pk)
+    try:
+        execute(queued.name, queued.payload)
+    except Exception:
+        finish(queued, traceback.format_exc())
+    else:
+        finish(queued)
+
+
+def requeue_stale():
+    """Return tasks whose worker died mid-run to the queue"""
+    from core.models import Task
+
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.TASK_QUEUE["LOCK_TIMEOUT"]
+    )
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=cutoff
+    ).update(status=Task.PENDING, locked_by="", locked_at=None)
+
+
+def purge_finished():
+    from core.models import Task
+
+    cutoff = timezone.now() - timedelta(
+        days=settings.TASK_QUEUE["KEEP_FINISHED_DAYS"]
+    )
+    deleted, _ = Task.objects.filter(
+        status__in=[Task.DONE, Task.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def initialize_pool_process():
+    """Spawned pool processes start bare and need Django set up"""
+    import django
+
+    django.setup()
@@ -1,3 +1,602 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core import (
+    allocation,
+    counters,
+    deletion,
+    hashers,
+    images,
+    leaderboard,
+)
+from core.models import (
+    Demand,
+    Donation,
+    ImageBlob,
+    ImpactBucket,
+    Profile,
+    Task,
+)
+from core.querylog import assert_max_repeats
+from core.storage import donation_image_storage
+
+
+def make_user(username, role="donor", **kwargs):
+    user = User.objects.create_user(
+        username=username, password="pw12345!", **kwargs
+    )
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        # Rate limit buckets outlive test transactions
+        caches["shared"].clear()
+        self.client = APIClient()
+        self.donor = make_user("donor", "donor")
+        self.receiver = make_user("receiver", "receiver")
+        self.admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "pw12345!"
+        )
+
+    def as_user(self, user):
+        self.client.force_authenticate(user)
+        return self.client
+
+
+class AdminMetricsTests(APITestCase):
+    def test_prometheus_format(self):
+        response = self.as_user(self.admin).get(
+            "/api/admin/metrics/?format=prometheus"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain")
+        )
+
+    def test_prometheus_format_forbidden_for_non_admins(self):
+        response = self.as_user(self.donor).get(
+            "/api/admin/metrics/", HTTP_ACCEPT="text/plain"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain")
+        )
+        self.assertIn(b"permission", response.content)
+
+    def test_prometheus_format_unauthenticated(self):
+        response = self.client.get(
+            "/api/admin/metrics/?format=prometheus"
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class ThrottlingTests(APITestCase):
+    def test_login_rate_limited_despite_forwarded_for(self):
+        # token_obtain_pair allows 10 a minute per client
+        responses = [
+            self.client.post(
+                "/api/token/",
+                {"username": "donor", "password": "wrong"},
+                HTTP_X_FORWARDED_FOR=f"203.0.113.{attempt}",
+            )
+            for attempt in range(15)
+        ]
+        statuses = [response.status_code for response in responses]
+        self.assertEqual(statuses[:10], [401] * 10)
+        self.assertEqual(set(statuses[10:]), {429})
+        self.assertFalse(responses[0].has_header("Retry-After"))
+        wait = int(responses[-1]["Retry-After"])
+        self.assertTrue(0 < wait <= 60, wait)
+
+
+class HashingTests(APITestCase):
+    def test_unknown_username_costs_a_staff_login(self):
+        with mock.patch(
+            "core.hashers.make_password", wraps=hashers.make_password
+        ) as make_password:
+            response = self.client.post(
+                "/api/token/",
+                {"username": "nobody", "password": "pw12345!"},
+            )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(
+            make_password.call_args.args[2].algorithm,
+            hashers.hasher_for_user(self.admin).algorithm,
+        )
+
+
+class IdempotencyTests(APITestCase):
+    def register(self, username, key, address="198.51.100.1"):
+        return self.client.post(
+            "/api/auth/register/",
+            {
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": "pw12345!",
+                "role": "donor",
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            REMOTE_ADDR=address,
+        )
+
+    def test_retry_is_replayed(self):
+        first = self.register("alice", "key-1")
+        retry = self.register("alice", "key-1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(
+            User.objects.filter(username="alice").count(), 1
+        )
+
+    def test_key_reused_for_another_request(self):
+        self.register("alice", "key-1")
+        response = self.register("bob", "key-1")
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(User.objects.filter(username="bob").exists())
+
+    def test_anonymous_keys_are_per_client(self):
+        self.register("alice", "key-1", address="198.51.100.1")
+        response = self.register(
+            "bob", "key-1", address="198.51.100.2"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertTrue(User.objects.filter(username="bob").exists())
+
+
+class CounterTests(APITestCase):
+    def donate(self, title="Bread", **kwargs):
+        return Donation.objects.create(
+            donor=self.donor,
+            title=title,
+            description="Fresh",
+            quantity=2,
+            location="Town hall",
+            **kwargs,
+        )
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_claim_keeps_counters_consistent(self):
+        donation = self.donate()
+        self.donate("Soup")
+        response = self.as_user(self.receiver).post(
+            f"/api/donations/{donation.pk}/claim/"
+        )
+        self.assertEqual(response.status_code, 200)
+        donor = self.profile(self.donor)
+        self.assertEqual(donor.donations_made, 2)
+        self.assertEqual(donor.active_donations, 1)
+        self.assertEqual(self.profile(self.receiver).claims_made, 1)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_reconcile_fixes_drift(self):
+        self.donate()
+        Profile.objects.filter(user=self.donor).update(
+            donations_made=7, active_donations=0
+        )
+        self.assertEqual(counters.reconcile(), 1)
+        donor = self.profile(self.donor)
+        self.assertEqual(donor.donations_made, 1)
+        self.assertEqual(donor.active_donations, 1)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_soft_delete_recomputes_last_donation(self):
+        older = self.donate()
+        newer = self.donate("Soup")
+        deletion.soft_delete([newer.pk])
+        self.assertEqual(
+            self.profile(self.donor).last_donation_at,
+            Donation.objects.get(pk=older.pk).created_at,
+        )
+        deletion.soft_delete([older.pk])
+        donor = self.profile(self.donor)
+        self.assertIsNone(donor.last_donation_at)
+        self.assertEqual(donor.donations_made, 0)
+        self.assertEqual(counters.reconcile(), 0)
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.donation = Donation.objects.create(
+            donor=self.donor,
+            title="Bread",
+            description="Fresh",
+            quantity=3,
+            location="Town hall",
+        )
+
+    def claims(self):
+        return list(
+            ImpactBucket.objects.filter(
+                user=self.receiver, role="receiver"
+            ).values_list("day", "count", "quantity")
+        )
+
+    def claim(self):
+        response = self.as_user(self.receiver).post(
+            f"/api/donations/{self.donation.pk}/claim/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.claims(), [(timezone.localdate(), 1, 3)]
+        )
+        self.assertEqual(
+            [
+                row["user_id"]
+                for row in leaderboard.top("receiver", 7)
+            ],
+            [self.receiver.pk],
+        )
+
+    def test_claimed_at_is_read_only(self):
+        self.claim()
+        response = self.as_user(self.donor).patch(
+            f"/api/donations/{self.donation.pk}/",
+            {"claimed_at": "2020-01-01T00:00:00Z"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.claims(), [(timezone.localdate(), 1, 3)]
+        )
+
+    def test_unclaim_removes_the_claim(self):
+        self.claim()
+        self.as_user(self.donor).patch(
+            f"/api/donations/{self.donation.pk}/",
+            {"is_claimed": False},
+            format="json",
+        )
+        self.assertEqual(
+            self.claims(), [(timezone.localdate(), 0, 0)]
+        )
+        self.assertEqual(leaderboard.top("receiver", 7), [])
+
+    def test_delete_removes_the_claim(self):
+        self.claim()
+        deletion.soft_delete([self.donation.pk])
+        self.assertEqual(
+            self.claims(), [(timezone.localdate(), 0, 0)]
+        )
+        self.assertEqual(leaderboard.top("receiver", 7), [])
+
+
+class AllocationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.donation = Donation.objects.create(
+            donor=self.donor,
+            title="Bread",
+            description="Fresh",
+            quantity=2,
+            location="Town hall",
+            latitude=27.7,
+            longitude=85.3,
+        )
+        Demand.objects.create(
+            user=self.receiver,
+            latitude=27.7,
+            longitude=85.3,
+            radius_km=5,
+            quantity=10,
+        )
+
+    @override_settings(
+        ALLOCATION={**settings.ALLOCATION, "ENABLED": False}
+    )
+    def test_disabled_allocates_nothing(self):
+        self.assertIsNone(allocation.allocate())
+        self.assertEqual(
+            allocation.allocate(dry_run=True).allocated, 1
+        )
+        self.donation.refresh_from_db()
+        self.assertFalse(self.donation.is_claimed)
+
+    @override_settings(
+        ALLOCATION={**settings.ALLOCATION, "ENABLED": True}
+    )
+    def test_enabled_allocates(self):
+        self.assertEqual(allocation.allocate().allocated, 1)
+        self.donation.refresh_from_db()
+        self.assertEqual(self.donation.claimed_by, self.receiver)
+
+    @override_settings(
+        ALLOCATION={
+            **settings.ALLOCATION,
+            "ENABLED": True,
+            "DISTANCE_WEIGHT": 0,
+        }
+    )
+    def test_fairness_is_per_receiver(self):
+        # The receiver splits their need over two demands; another
+        # receiver asks for the same amount in one
+        Demand.objects.create(
+            user=self.receiver,
+            latitude=27.7,
+            longitude=85.3,
+            radius_km=5,
+            quantity=10,
+        )
+        other = make_user("other", "receiver")
+        Demand.objects.create(
+            user=other,
+            latitude=27.7,
+            longitude=85.3,
+            radius_km=5,
+            quantity=20,
+        )
+        Donation.objects.create(
+            donor=self.donor,
+            title="Soup",
+            description="Hot",
+            quantity=2,
+            location="Town hall",
+            latitude=27.7,
+            longitude=85.3,
+        )
+        self.assertEqual(allocation.allocate().receivers, 2)
+
+    @override_settings(
+        ALLOCATION={**settings.ALLOCATION, "ENABLED": True}
+    )
+    def test_deleted_during_run_is_not_claimed(self):
+        assign = allocation.assign
+
+        def delete_then_assign(*args):
+            deletion.soft_delete([self.donation.pk])
+            return assign(*args)
+
+        with mock.patch.object(
+            allocation, "assign", side_effect=delete_then_assign
+        ):
+            self.assertEqual(allocation.allocate().allocated, 0)
+        donation = Donation.all_objects.get(pk=self.donation.pk)
+        self.assertFalse(donation.is_claimed)
+        self.assertEqual(
+            Demand.objects.get(user=self.receiver).allocated, 0
+        )
+        self.assertEqual(counters.reconcile(), 0)
+
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def post_image(client, content, content_type="image/jpeg"):
+    return client.post(
+        "/api/donations/",
+        {
+            "title": "Bread",
+            "description": "Fresh",
+            "quantity": 2,
+            "location": "Town hall",
+            "image": SimpleUploadedFile(
+                "photo.jpg", content, content_type=content_type
+            ),
+        },
+        format="multipart",
+    )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UploadTests(APITestCase):
+    def post_image(self, content, content_type):
+        return post_image(
+            self.as_user(self.donor), content, content_type
+        )
+
+    def test_declared_type_is_not_trusted(self):
+        for content_type in (
+            "image/jpg",
+            "application/octet-stream",
+            "image/png",
+        ):
+            response = self.post_image(jpeg_bytes(), content_type)
+            self.assertEqual(response.status_code, 201, content_type)
+
+    def test_variants_need_no_lookups_or_token(self):
+        pk = self.post_image(jpeg_bytes(), "image/jpeg").data["id"]
+        with mock.patch.object(
+            donation_image_storage, "exists"
+        ) as exists:
+            response = self.client.get("/api/donations/")
+        exists.assert_not_called()
+        urls = response.data[0]["image_variants"]
+        self.assertTrue(urls["thumbnail"].endswith("_thumbnail.webp"))
+
+        self.client.force_authenticate(None)
+        response = self.client.get(
+            f"/api/donations/{pk}/image/thumbnail/"
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], urls["thumbnail"])
+
+    def test_content_must_be_an_image(self):
+        response = self.post_image(b"<?php echo 1; ?>", "image/jpeg")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Donation.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DeletionTests(APITestCase):
+    def test_soft_delete_schedules_a_purge(self):
+        response = post_image(self.as_user(self.donor), jpeg_bytes())
+        before = timezone.now()
+        self.client.delete(f"/api/donations/{response.data['id']}/")
+        purge = Task.objects.get(
+            name=deletion.purge_donations.task_name
+        )
+        hours = settings.SOFT_DELETE["PURGE_AFTER_HOURS"]
+        self.assertGreaterEqual(
+            purge.run_after, before + timedelta(hours=hours)
+        )
+        self.assertLess(
+            purge.run_after, before + timedelta(hours=hours + 1)
+        )
+        # Deletions in the same hour share it
+        other = post_image(self.as_user(self.donor), jpeg_bytes())
+        self.client.delete(f"/api/donations/{other.data['id']}/")
+        self.assertEqual(
+            Task.objects.filter(name=purge.name).count(), 1
+        )
+
+    def test_deleted_at_is_read_only(self):
+        response = post_image(self.as_user(self.donor), jpeg_bytes())
+        pk = response.data["id"]
+        response = self.client.patch(
+            f"/api/donations/{pk}/",
+            {"deleted_at": timezone.now().isoformat()},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["deleted_at"])
+        self.assertTrue(Donation.objects.filter(pk=pk).exists())
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_purge_releases_shared_image(self):
+        client = self.as_user(self.donor)
+        ids = [
+            post_image(client, jpeg_bytes()).data["id"]
+            for _ in range(2)
+        ]
+        name = Donation.objects.get(pk=ids[0]).image.name
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 2)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        self.assertTrue(os.path.exists(path))
+
+        # Soft-deleted donations keep their image until purged
+        deletion.soft_delete([ids[0]])
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 2)
+        Donation.all_objects.filter(pk=ids[0]).update(
+            deleted_at=timezone.now() - timedelta(days=2)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(deletion.purge_donations(), 1)
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+        self.assertTrue(os.path.exists(path))
+
+        deletion.soft_delete([ids[1]])
+        Donation.all_objects.filter(pk=ids[1]).update(
+            deleted_at=timezone.now() - timedelta(days=2)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(deletion.purge_donations(), 1)
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(path))
+
+
+class ListQueryTests(APITestCase):
+    """List endpoints must not run a query per row"""
+
+    def setUp(self):
+        super().setUp()
+        for index in range(6):
+            donor = make_user(f"donor{index}")
+            donation = Donation.objects.create(
+                donor=donor,
+                title=f"Bread {index}",
+                description="Fresh",
+                quantity=2,
+                location="Town hall",
+                latitude=27.7,
+                longitude=85.3,
+            )
+            if index % 2:
+                self.as_user(self.receiver).post(
+                    f"/api/donations/{donation.pk}/claim/"
+                )
+            Demand.objects.create(
+                user=self.receiver,
+                latitude=27.7,
+                longitude=85.3,
+                radius_km=5,
+                quantity=index + 1,
+            )
+        for index in range(3):
+            Donation.objects.create(
+                donor=self.donor,
+                title=f"Soup {index}",
+                description="Hot",
+                quantity=1,
+                location="Town hall",
+            )
+
+    def assert_list(self, user, url):
+        client = self.as_user(user)
+        with self.subTest(url=url, user=user.username):
+            with assert_max_repeats(2):
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_list_endpoints(self):
+        for user, url in (
+            (self.receiver, "/api/donations/"),
+            (self.donor, "/api/donations/"),
+            (self.receiver, "/api/demands/"),
+            (self.receiver, "/api/receiver-areas/"),
+            (self.receiver, "/api/notifications/"),
+            (self.admin, "/api/users/"),
+            (self.donor, f"/api/users/{self.donor.pk}/donations/"),
+            (
+                self.receiver,
+                "/api/donations/claimed_by_user/"
+                f"?user_id={self.receiver.pk}",
+            ),
+        ):
+            self.assert_list(user, url)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageBlobTests(TestCase):
+    def store(self, name):
+        return donation_image_storage.save_exact(
+            name, ContentFile(b"image")
+        )
+
+    def test_delete_keeps_legacy_siblings(self):
+        name = self.store("donations/bread.jpg")
+        variant = self.store(images.variant_name(name, "thumbnail"))
+        # As Django's default storage named a second bread.jpg
+        sibling = self.store("donations/bread_Ab3dE9f.jpg")
+
+        ImageBlob.objects.retain(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            ImageBlob.objects.release(name, donation_image_storage)
+        self.assertFalse(donation_image_storage.exists(name))
+        self.assertFalse(donation_image_storage.exists(variant))
+        self.assertTrue(donation_image_storage.exists(sibling))
+
+    def test_file_retained_before_delete_is_kept(self):
+        name = self.store("donations/ab/abcdef.webp")
+        ImageBlob.objects.retain(name)
+        with self.captureOnCommitCallbacks() as callbacks:
+            ImageBlob.objects.release(name, donation_image_storage)
+        # The same bytes are uploaded again before the commit hook runs
+        ImageBlob.objects.retain(name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(donation_image_storage.exists(name))
@@ -0,0 +1,135 @@
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from django.utils.text import Truncator
+
+# Tags the CKEditor toolbar in settings can produce
+ALLOWED_TAGS = {
+    "p",
+    "br",
+    "strong",
+    "b",
+    "em",
+    "i",
+    "u",
+    "ol",
+    "ul",
+    "li",
+    "a",
+}
+VOID_TAGS = {"br"}
+BLOCK_TAGS = {"p", "br", "li", "ol", "ul", "div", "blockquote"}
+DROP_CONTENT_TAGS = {"script", "style"}
+ALLOWED_STYLE = re.compile(
+    r"^\s*text-align\s*:\s*(left|right|center|justify)\s*;?\s*$"
+)
+ALLOWED_URL = re.compile(r"^(https?:|mailto:)", re.IGNORECASE)
+
+EXCERPT_LENGTH = 200
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if tag not in ALLOWED_TAGS or self.dropping:
+            return
+        # An unclosed <li> or <p> ends where its next sibling starts
+        if tag in ("li", "p") and self.open_tags[-1:] == [tag]:
+            self.parts.append(f"</{self.open_tags.pop()}>")
+
+        kept = []
+        for name, value in attrs:
+            value = value or ""
+            if name == "style" and ALLOWED_STYLE.match(value):
+                kept.append((name, value.strip()))
+            elif (
+                tag == "a"
+                and name == "href"
+                and ALLOWED_URL.match(value)
+            ):
+                kept.append((name, value))
+        if tag == "a":
+            kept.append(("rel", "nofollow noopener"))
+
+        rendered = "".join(
+            f' {name}="{escape(value)}"' for name, value in kept
+        )
+        self.parts.append(f"<{tag}{rendered}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if tag not in self.open_tags or self.dropping:
+            return
+        # Close anything left open inside this tag as well
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.parts.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        closing = [f"</{tag}>" for tag in reversed(self.open_tags)]
+        return "".join(self.parts + closing)
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(data)
+
+    def result(self):
+        self.close()
+        return " ".join("".join(self.parts).split())
+
+
+def sanitize_html(value):
+    """Reduce rich text to the allowlisted tags and attributes"""
+    parser = _Sanitizer()
+    parser.feed(value or "")
+    return parser.result()
+
+
+def html_to_text(value):
+    """Strip all markup, collapsing whitespace"""
+    parser = _TextExtractor()
+    parser.feed(value or "")
+    return parser.result()
+
+
+def excerpt(text, length=EXCERPT_LENGTH):
+    return Truncator(text).chars(length)
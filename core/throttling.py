@@ -0,0 +1,123 @@
+"""Token-bucket rate limiting shared by every worker process
+
+Each client has a general bucket, keyed by user when authenticated
+and by IP address otherwise, and routes listed in THROTTLING["ROUTES"]
+(by URL name) add a stricter bucket of their own. A rate of "60/min"
+is a bucket of 60 tokens refilled continuously over a minute, so
+clients can burst up to the capacity and then sustain the rate. A
+request must find a token in every bucket that applies; otherwise it
+gets a 429 with Retry-After set to when one will be available.
+
+Buckets live in the THROTTLING["CACHE"] cache, which must be shared
+between processes for the limits to hold across workers. Updates are
+read-modify-write, not atomic: concurrent requests from one client
+can occasionally both take the last token, which is accepted rather
+than paying for a lock on every request.
+"""
+
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from rest_framework.throttling import BaseThrottle
+
+from core.metrics import registry
+
+PERIODS = {"s": 1, "sec": 1, "min": 60, "hour": 3600, "day": 86400}
+
+
+class BucketFileCache(FileBasedCache):
+    """FileBasedCache for small, hot entries
+
+    The stock backend lists its whole directory on every write to
+    decide whether to cull, which at ten thousand clients costs more
+    than the request being throttled. Here only one write in
+    CULL_EVERY checks.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_every = int(
+            params.get("OPTIONS", {}).get("CULL_EVERY", 100)
+        )
+
+    def _cull(self):
+        if random.randrange(self._cull_every) == 0:
+            super()._cull()
+
+
+def parse_rate(rate):
+    """``"60/min"`` -> (capacity 60, 1.0 tokens per second)"""
+    count, _, period = rate.partition("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period]
+
+
+def take(cache, key, rates, now):
+    """Take a token from each of a client's buckets, ``{scope: (capacity,
+    tokens per second)}``, if all have one; returns 0, or the seconds
+    until the emptiest bucket has a token again"""
+    # All of a client's buckets share one entry: one read and one
+    # write per request
+    buckets = cache.get(key) or {}
+    updated = dict(buckets)
+    wait = 0.0
+    timeout = 1
+    for scope, (capacity, per_second) in rates.items():
+        tokens, stamp = buckets.get(scope, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * per_second)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / per_second)
+        updated[scope] = (tokens - 1, now)
+        # Left alone this long, the bucket is full again, the same as
+        # a missing one
+        timeout = max(timeout, (capacity - tokens + 1) / per_second)
+    if wait:
+        return wait
+    cache.set(key, updated, timeout=int(timeout) + 1)
+    return 0.0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        config = settings.THROTTLING
+        self.retry_after = None
+        if not config["ENABLED"]:
+            return True
+        if request.user and request.user.is_authenticated:
+            scope, ident = "user", f"user:{request.user.pk}"
+        else:
+            scope, ident = "anon", f"ip:{self.get_ident(request)}"
+        scopes = [scope]
+        match = request.resolver_match
+        if match and match.url_name in config["ROUTES"]:
+            scopes.append(match.url_name)
+        rates = {
+            name: parse_rate(
+                config["ROUTES"][name]
+                if name in config["ROUTES"]
+                else config["RATES"][name]
+            )
+            for name in scopes
+        }
+        wait = take(
+            caches[config["CACHE"]],
+            f"throttle:{ident}",
+            rates,
+            time.time(),
+        )
+        # The strictest scope is the one reported
+        registry.increment(
+            "throttle_requests",
+            scope=scopes[-1],
+            result="throttled" if wait else "allowed",
+        )
+        if wait:
+            self.retry_after = wait
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,103 @@
+import hashlib
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from django.template.defaultfilters import filesizeformat
+
+SNIFF_LENGTH = 12
+
+
+def sniff(head):
+    """The image type the leading bytes ``head`` belong to, or None
+    for anything but JPEG, PNG, WebP and AVIF"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return None
+
+
+class HashedUploadedFile(UploadedFile):
+    """An upload spooled to memory or disk, with its SHA-256 digest"""
+
+    def __init__(self, file, content_hash, **kwargs):
+        super().__init__(file, **kwargs)
+        self.content_hash = content_hash
+
+
+class DonationImageUploadHandler(FileUploadHandler):
+    """Streams uploads through size/type checks, hashing as bytes arrive"""
+
+    def new_file(
+        self, field_name, file_name, content_type, *args, **kwargs
+    ):
+        # The declared type is not checked: clients send image/jpg,
+        # application/octet-stream and the like, and the content is
+        # sniffed anyway
+        super().new_file(
+            field_name, file_name, content_type, *args, **kwargs
+        )
+        if (
+            self.content_length
+            and self.content_length
+            > settings.DONATION_UPLOAD_MAX_SIZE
+        ):
+            self._too_large()
+
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=settings.DONATION_UPLOAD_SPOOL_THRESHOLD
+        )
+        self.hasher = hashlib.sha256()
+        self.head = b""
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.DONATION_UPLOAD_MAX_SIZE:
+            self.file.close()
+            self._too_large()
+
+        if len(self.head) < SNIFF_LENGTH:
+            self.head += raw_data[: SNIFF_LENGTH - len(self.head)]
+            if len(self.head) == SNIFF_LENGTH:
+                self._check_signature()
+
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if len(self.head) < SNIFF_LENGTH:
+            self._check_signature()
+        self.file.seek(0)
+        return HashedUploadedFile(
+            self.file,
+            self.hasher.hexdigest(),
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+    def _check_signature(self):
+        content_type = sniff(self.head)
+        if content_type is None:
+            self.file.close()
+            raise MultiPartParserError(
+                "Unsupported image type: upload a JPEG, PNG, WebP or "
+                "AVIF image."
+            )
+        self.content_type = content_type
+
+    def _too_large(self):
+        limit = filesizeformat(settings.DONATION_UPLOAD_MAX_SIZE)
+        raise MultiPartParserError(
+            f"Image uploads are limited to {limit}."
+        )
@@ -2,18 +2,36 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from core.views import (
+    AdminDonationDetailView,
     AdminDonationsView,
+    AdminInviteView,
+    AdminMetricsView,
     AdminStatsView,
+    APIRootView,
+    DemandViewSet,
     DonationViewSet,
+    LeaderboardView,
     MeView,
+    NotificationViewSet,
+    ReceiverAreaViewSet,
     RegisterView,
     UserDonationsView,
     UserViewSet,
+    openapi_schema,
+    openapi_schema_versioned,
 )
 
 router = DefaultRouter()
+router.APIRootView = APIRootView
 router.register(r"donations", DonationViewSet, basename="donation")
 router.register(r"users", UserViewSet, basename="user")
+router.register(
+    r"receiver-areas", ReceiverAreaViewSet, basename="receiver-area"
+)
+router.register(r"demands", DemandViewSet, basename="demand")
+router.register(
+    r"notifications", NotificationViewSet, basename="notification"
+)
 
 
 urlpatterns = [
@@ -26,12 +44,36 @@ urlpatterns = [
         AdminDonationsView.as_view(),
         name="admin-donations",
     ),
+    path(
+        "admin/donations/<int:donation_id>/",
+        AdminDonationDetailView.as_view(),
+        name="admin-donation-detail",
+    ),
+    path(
+        "admin/users/invite/",
+        AdminInviteView.as_view(),
+        name="admin-invite",
+    ),
+    path(
+        "admin/metrics/",
+        AdminMetricsView.as_view(),
+        name="admin-metrics",
+    ),
 ]
 
 
 urlpatterns += [
+    path("schema/", openapi_schema, name="openapi-schema"),
+    path(
+        "schema/<slug:digest>.json",
+        openapi_schema_versioned,
+        name="openapi-schema-versioned",
+    ),
     path("auth/register/", RegisterView.as_view(), name="register"),
     path("me/", MeView.as_view(), name="me"),
+    path(
+        "leaderboard/", LeaderboardView.as_view(), name="leaderboard"
+    ),
     path(
         "users/<int:user_id>/donations/",
         UserDonationsView.as_view(),
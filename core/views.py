@@ -1,42 +1,146 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from django.views.static import serve
 from rest_framework import (
     generics,
     mixins,
     permissions,
+    routers,
     status,
     viewsets,
 )
 from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.schemas.openapi import AutoSchema
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from core.models import Donation
+from core import (
+    counters,
+    deletion,
+    geocoding,
+    idempotency,
+    images,
+    leaderboard,
+    metrics,
+    notifications,
+    schema,
+)
+from core.models import (
+    ArchivedDonation,
+    Donation,
+    Notification,
+    Profile,
+)
 from core.permissions import IsDonor, IsReceiver
+from core.renderers import PrometheusRenderer
+from core.replicas import replica_reads
 from core.serializers import (
+    ArchivedDonationSerializer,
+    BulkInviteSerializer,
+    DemandSerializer,
+    DonationListSerializer,
     DonationSerializer,
+    InvitedUserSerializer,
+    NotificationSerializer,
+    ReceiverAreaSerializer,
     RegisterSerializer,
     UserDetailSerializer,
     UserSerializer,
     UserUpdateSerializer,
 )
+from core.storage import donation_image_storage
+from core.uploads import DonationImageUploadHandler
+
+
+def serve_image_blob(request, path):
+    """Serve a content-addressed image with a far-future cache lifetime"""
+    response = serve(
+        request, path, document_root=donation_image_storage.location
+    )
+    # The name is the content hash, so the bytes can never change
+    patch_cache_control(
+        response, public=True, max_age=31536000, immutable=True
+    )
+    return response
+
+
+def _schema_etag(request, digest=None):
+    return schema.get().digest
+
+
+@condition(etag_func=_schema_etag)
+def openapi_schema(request):
+    """The current schema; revalidated on every use via its ETag"""
+    current = schema.get()
+    response = HttpResponse(
+        current.content,
+        content_type="application/vnd.oai.openapi+json",
+    )
+    versioned = reverse(
+        "openapi-schema-versioned", kwargs={"digest": current.digest}
+    )
+    response["Link"] = f'<{versioned}>; rel="alternate"'
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@condition(etag_func=_schema_etag)
+def openapi_schema_versioned(request, digest):
+    """The schema by content hash, cacheable forever"""
+    current = schema.get()
+    if digest != current.digest:
+        raise Http404("Unknown schema version")
+    response = HttpResponse(
+        current.content,
+        content_type="application/vnd.oai.openapi+json",
+    )
+    patch_cache_control(
+        response, public=True, max_age=31536000, immutable=True
+    )
+    return response
+
+
+class APIRootView(routers.APIRootView):
+    """The browsable API root, with a link to the schema"""
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        response["Link"] = (
+            f'<{reverse("openapi-schema")}>; rel="service-desc"'
+        )
+        return response
 
 
 class AdminStatsView(APIView):
     permission_classes = [IsAdminUser]
 
+    @replica_reads
     def get(self, request):
-        from datetime import datetime, timedelta
-
-        from django.db.models import Count, Q
-
         # Basic stats
         total_users = User.objects.count()
-        total_donations = Donation.objects.count()
-        claimed_donations = Donation.objects.filter(
-            is_claimed=True
-        ).count()
+        # Archived donations are old and claimed or expired: they count
+        # towards the totals, not towards recent activity
+        total_donations = (
+            Donation.objects.count()
+            + ArchivedDonation.objects.count()
+        )
+        claimed_donations = (
+            Donation.objects.filter(is_claimed=True).count()
+            + ArchivedDonation.objects.filter(is_claimed=True).count()
+        )
         available_donations = Donation.objects.filter(
             is_claimed=False
         ).count()
@@ -59,11 +163,19 @@ class AdminStatsView(APIView):
         ).count()
 
         # Food type breakdown
-        food_type_stats = (
-            Donation.objects.values("food_type")
-            .annotate(count=Count("id"))
-            .order_by("-count")
-        )
+        food_type_counts = Counter()
+        for model in (Donation, ArchivedDonation):
+            food_type_counts.update(
+                dict(
+                    model.objects.values("food_type")
+                    .annotate(count=Count("id"))
+                    .values_list("food_type", "count")
+                )
+            )
+        food_type_stats = [
+            {"food_type": food_type, "count": count}
+            for food_type, count in food_type_counts.most_common()
+        ]
 
         # Monthly trends (last 6 months)
         monthly_stats = []
@@ -90,6 +202,10 @@ class AdminStatsView(APIView):
         recent_donations_list = Donation.objects.select_related(
             "donor", "claimed_by"
         ).order_by("-created_at")[:10]
+        with metrics.phase("serialize"):
+            recent_donations_data = DonationListSerializer(
+                recent_donations_list, many=True
+            ).data
 
         return Response(
             {
@@ -103,9 +219,7 @@ class AdminStatsView(APIView):
                 "recent_claims_30d": recent_claims,
                 "food_type_stats": list(food_type_stats),
                 "monthly_trends": monthly_stats,
-                "recent_donations_list": DonationSerializer(
-                    recent_donations_list, many=True
-                ).data,
+                "recent_donations_list": recent_donations_data,
                 "claim_rate": (
                     (claimed_donations / total_donations * 100)
                     if total_donations > 0
@@ -118,46 +232,196 @@ class AdminStatsView(APIView):
 class AdminDonationsView(APIView):
     permission_classes = [IsAdminUser]
 
+    @replica_reads
     def get(self, request):
-        """Get all donations for admin management"""
+        """Get all donations for admin management;
+        ``?archived=true`` pages through the archive instead"""
+        if request.query_params.get("archived") == "true":
+            return self.get_archived(request)
         donations = Donation.objects.select_related(
             "donor", "claimed_by"
         ).order_by("-created_at")
-        serializer = DonationSerializer(donations, many=True)
-        return Response(serializer.data)
+        with metrics.phase("serialize"):
+            data = DonationListSerializer(donations, many=True).data
+        return Response(data)
+
+    def get_archived(self, request):
+        paginator = LimitOffsetPagination()
+        paginator.default_limit = settings.ARCHIVE["PAGE_SIZE"]
+        paginator.max_limit = settings.ARCHIVE["MAX_PAGE_SIZE"]
+        archived = ArchivedDonation.objects.select_related(
+            "donor", "claimed_by"
+        ).order_by("-created_at", "-id")
+        page = paginator.paginate_queryset(
+            archived, request, view=self
+        )
+        with metrics.phase("serialize"):
+            data = ArchivedDonationSerializer(page, many=True).data
+        return paginator.get_paginated_response(data)
+
+
+class AdminDonationDetailView(APIView):
+    permission_classes = [IsAdminUser]
 
     def delete(self, request, donation_id):
         """Delete a donation (admin only)"""
-        try:
-            donation = Donation.objects.get(id=donation_id)
-            donation.delete()
+        if deletion.soft_delete([donation_id]):
             return Response(
                 {"message": "Donation deleted successfully"},
                 status=status.HTTP_204_NO_CONTENT,
             )
-        except Donation.DoesNotExist:
+        return Response(
+            {"error": "Donation not found"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+
+class AdminMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
+        PrometheusRenderer
+    ]
+
+    def get(self, request):
+        """Per-route request metrics for this worker process"""
+        if request.accepted_renderer.format == "prometheus":
+            return Response(metrics.registry.render_prometheus())
+        return Response(
+            {
+                "sample_rate": settings.REQUEST_METRICS[
+                    "SAMPLE_RATE"
+                ],
+                **metrics.registry.snapshot(),
+            }
+        )
+
+    def delete(self, request):
+        """Reset the collected metrics"""
+        metrics.registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AdminInviteView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        """Create a batch of donor/receiver accounts"""
+        serializer = BulkInviteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        users = serializer.save()
+        return Response(
+            InvitedUserSerializer(users, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class LeaderboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Top donors or receivers over a rolling window"""
+        role = request.query_params.get("role", "donor")
+        metric = request.query_params.get("metric", "quantity")
+        try:
+            window = int(request.query_params.get("window", 30))
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
             return Response(
-                {"error": "Donation not found"},
-                status=status.HTTP_404_NOT_FOUND,
+                {"error": "window and limit must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        if role not in dict(Profile.ROLE_CHOICES):
+            return Response(
+                {"error": "role must be donor or receiver"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if metric not in leaderboard.METRICS:
+            return Response(
+                {"error": "metric must be count or quantity"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if window not in settings.LEADERBOARD_WINDOWS:
+            return Response(
+                {
+                    "error": "window must be one of "
+                    + ", ".join(
+                        map(str, settings.LEADERBOARD_WINDOWS)
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = min(max(limit, 1), settings.LEADERBOARD_MAX_LIMIT)
 
+        ranking = leaderboard.top(role, window, metric, limit)
+        return Response(
+            {
+                "role": role,
+                "metric": metric,
+                "window_days": window,
+                "results": [
+                    {
+                        "rank": rank,
+                        "user_id": row["user_id"],
+                        "username": row["user__username"],
+                        "count": row["count"],
+                        "quantity": row["quantity"],
+                    }
+                    for rank, row in enumerate(ranking, start=1)
+                ],
+            }
+        )
 
-class RegisterView(generics.CreateAPIView):
+
+class RegisterView(
+    idempotency.IdempotencyMixin, generics.CreateAPIView
+):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    schema = AutoSchema(operation_id_base="Registration")
 
 
-class DonationViewSet(viewsets.ModelViewSet):
+class DonationViewSet(
+    idempotency.IdempotencyMixin, viewsets.ModelViewSet
+):
     queryset = Donation.objects.all()
     serializer_class = DonationSerializer
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be swapped before the multipart body is first read
+        request.upload_handlers = [
+            DonationImageUploadHandler(request)
+        ]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            # donor_name would otherwise cost a query per row
+            queryset = queryset.select_related("donor")
+        search = self.request.query_params.get("search")
+        if self.action == "list" and search:
+            # Matches the plain text stored at write time, not raw HTML
+            queryset = queryset.filter(
+                Q(title__icontains=search)
+                | Q(description_text__icontains=search)
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return DonationListSerializer
+        return super().get_serializer_class()
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["request"] = self.request
         return context
 
     def get_permissions(self):
+        # Image variants load from <img src>, which sends no token
+        if self.action == "image":
+            return [permissions.AllowAny()]
         # Admin users can do everything
         if self.request.user.is_superuser:
             return [permissions.IsAuthenticated()]
@@ -170,15 +434,52 @@ class DonationViewSet(viewsets.ModelViewSet):
             "destroy",
         ]:
             return [permissions.IsAuthenticated(), IsDonor()]
-        # Only receivers can claim donations
-        if self.action == "claim":
+        # Only receivers can claim donations and plan pickups
+        if self.action in ["claim", "route"]:
             return [permissions.IsAuthenticated(), IsReceiver()]
         # Authenticated users can list and retrieve
         return [permissions.IsAuthenticated()]
 
     def perform_create(self, serializer):
         # Automatically set the donor to the logged-in user
-        serializer.save(donor=self.request.user)
+        donation = serializer.save(donor=self.request.user)
+        self._schedule_image_variants(donation)
+        if donation.latitude is None and donation.longitude is None:
+            geocoding.schedule_donation(donation.pk)
+        else:
+            notifications.schedule_donation(donation.pk)
+
+    def perform_update(self, serializer):
+        donation = serializer.save()
+        if "image" in serializer.validated_data:
+            self._schedule_image_variants(donation)
+
+    def perform_destroy(self, instance):
+        deletion.soft_delete([instance.pk])
+
+    def _schedule_image_variants(self, donation):
+        if donation.image:
+            images.schedule_variants(donation.image.name)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"image/(?P<variant>[a-z]+)",
+        permission_classes=[permissions.AllowAny],
+    )
+    def image(self, request, pk=None, variant=None):
+        """Redirect to an image variant, generating it on first use"""
+        donation = self.get_object()
+        if (
+            not donation.image
+            or variant not in settings.DONATION_IMAGE_VARIANTS
+        ):
+            raise Http404
+        name = images.ensure_variant(donation.image.name, variant)
+        storage = donation.image.storage
+        return HttpResponseRedirect(
+            request.build_absolute_uri(storage.url(name))
+        )
 
     @action(
         detail=True,
@@ -186,17 +487,39 @@ class DonationViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated, IsReceiver],
     )
     def claim(self, request, pk=None):
+        if settings.ALLOCATION["ENABLED"]:
+            return Response(
+                {
+                    "error": "Donations are allocated in batches; "
+                    "submit demand at /api/demands/ instead."
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
         donation = self.get_object()
-        if donation.is_claimed:
+        before = donation.state()
+        after = before._replace(
+            is_claimed=True,
+            claimed_by_id=request.user.id,
+            claimed_at=timezone.now(),
+        )
+        # Conditional update so concurrent claims cannot both succeed;
+        # it sends no signals, so the aggregates are recorded here
+        with transaction.atomic():
+            claimed = Donation.objects.filter(
+                pk=donation.pk, is_claimed=False
+            ).update(
+                is_claimed=True,
+                claimed_by=request.user,
+                claimed_at=after.claimed_at,
+            )
+            if claimed:
+                counters.record(before, after)
+        if not claimed:
             return Response(
                 {"error": "This donation has already been claimed."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        donation.is_claimed = True
-        donation.claimed_by = request.user
-        donation.save()
-
         return Response(
             {"success": "Donation claimed successfully."},
             status=status.HTTP_200_OK,
@@ -225,18 +548,147 @@ class DonationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        claimed_donations = Donation.objects.filter(
-            claimed_by_id=user_id, is_claimed=True
-        ).order_by("-created_at")
+        claimed_donations = (
+            Donation.objects.filter(
+                claimed_by_id=user_id, is_claimed=True
+            )
+            .select_related("donor")
+            .order_by("-created_at")
+        )
 
-        serializer = DonationSerializer(claimed_donations, many=True)
+        serializer = DonationListSerializer(
+            claimed_donations, many=True
+        )
         return Response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated, IsReceiver],
+    )
+    def route(self, request):
+        """Pickup order from ``lat``/``lng`` through the receiver's
+        unexpired claims, or through the donations in ``ids``"""
+        try:
+            latitude = float(request.query_params["lat"])
+            longitude = float(request.query_params["lng"])
+        except (KeyError, ValueError):
+            return Response(
+                {
+                    "error": "lat and lng parameters are required numbers"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response(
+                {"error": "lat or lng out of range"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        max_stops = settings.ROUTING["MAX_STOPS"]
+        ids = request.query_params.get("ids")
+        if ids:
+            try:
+                ids = {int(pk) for pk in ids.split(",")}
+            except ValueError:
+                return Response(
+                    {"error": "ids must be comma-separated integers"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if len(ids) > max_stops:
+                return Response(
+                    {"error": f"At most {max_stops} stops per route"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            # Candidates may be the receiver's claims or still open
+            queryset = Donation.objects.filter(
+                Q(claimed_by=request.user) | Q(is_claimed=False),
+                id__in=ids,
+            )
+        else:
+            # The claims due soonest when there are too many to route
+            queryset = Donation.objects.filter(
+                Q(expiry_date__isnull=True)
+                | Q(expiry_date__gte=timezone.localdate()),
+                claimed_by=request.user,
+                is_claimed=True,
+            ).order_by(F("expiry_date").asc(nulls_last=True), "id")[
+                :max_stops
+            ]
+        donations = list(
+            queryset.only(
+                "id",
+                "title",
+                "location",
+                "latitude",
+                "longitude",
+                "expiry_date",
+            )
+        )
+        located = [
+            donation
+            for donation in donations
+            if donation.latitude is not None
+            and donation.longitude is not None
+        ]
+
+        # Imported here: NumPy is the largest import of a worker and
+        # nothing else serving requests needs it
+        from core import routing
+
+        with metrics.phase("routing"):
+            route = routing.plan(
+                (latitude, longitude),
+                [
+                    (
+                        donation,
+                        donation.latitude,
+                        donation.longitude,
+                        routing.expiry_deadline(donation.expiry_date),
+                    )
+                    for donation in located
+                ],
+            )
+        return Response(
+            {
+                "start": {
+                    "latitude": latitude,
+                    "longitude": longitude,
+                },
+                "distance_km": round(route.distance_km, 3),
+                "duration_minutes": round(
+                    route.duration.total_seconds() / 60, 1
+                ),
+                "stops": [
+                    {
+                        "id": stop.key.id,
+                        "title": stop.key.title,
+                        "location": stop.key.location,
+                        "latitude": stop.key.latitude,
+                        "longitude": stop.key.longitude,
+                        "expiry_date": stop.key.expiry_date,
+                        "leg_km": round(stop.leg_km, 3),
+                        "eta": stop.arrival,
+                        "late": stop.late,
+                    }
+                    for stop in route.stops
+                ],
+                # Not geocoded yet, so left out of the route
+                "unrouted": sorted(
+                    donation.id
+                    for donation in donations
+                    if donation.latitude is None
+                    or donation.longitude is None
+                ),
+            }
+        )
+
     @action(
         detail=False,
         methods=["get"],
         permission_classes=[permissions.IsAuthenticated],
     )
+    @replica_reads
     def statistics(self, request):
         """Get donation statistics for map visualization"""
         try:
@@ -276,42 +728,25 @@ class DonationViewSet(viewsets.ModelViewSet):
             )
 
             # Get geographic clustering data
-            if zoom_level >= 15:
-                # High zoom: individual donations
-                clusters = []
-                for donation in queryset.filter(
-                    latitude__isnull=False, longitude__isnull=False
-                ):
-                    clusters.append(
-                        {
-                            "center": [
-                                donation.latitude,
-                                donation.longitude,
-                            ],
-                            "donations": [donation.id],
-                            "stats": {
-                                "total": 1,
-                                "available": (
-                                    0 if donation.is_claimed else 1
-                                ),
-                                "claimed": (
-                                    1 if donation.is_claimed else 0
-                                ),
-                                "food_types": {
-                                    donation.food_type or "other": 1
-                                },
-                            },
-                        }
+            with metrics.phase("clustering"):
+                if zoom_level >= 15:
+                    # High zoom: individual donations
+                    clusters = self._create_individual_clusters(
+                        queryset
+                    )
+                else:
+                    # Medium/low zoom: create clusters
+                    grid_size = 0.01 if zoom_level >= 10 else 0.05
+                    clusters = self._create_geographic_clusters(
+                        queryset, grid_size
                     )
-            else:
-                # Medium/low zoom: create clusters
-                grid_size = 0.01 if zoom_level >= 10 else 0.05
-                clusters = self._create_geographic_clusters(
-                    queryset, grid_size
-                )
 
             # Get recent activity
             recent_donations = queryset.order_by("-created_at")[:10]
+            with metrics.phase("serialize"):
+                recent_activity = DonationListSerializer(
+                    recent_donations, many=True
+                ).data
 
             return Response(
                 {
@@ -331,9 +766,7 @@ class DonationViewSet(viewsets.ModelViewSet):
                     },
                     "food_types": list(food_type_stats),
                     "clusters": clusters,
-                    "recent_activity": DonationSerializer(
-                        recent_donations, many=True
-                    ).data,
+                    "recent_activity": recent_activity,
                     "zoom_level": zoom_level,
                 }
             )
@@ -344,6 +777,28 @@ class DonationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    def _create_individual_clusters(self, queryset):
+        """One single-donation cluster per located donation"""
+        clusters = []
+        for donation in queryset.filter(
+            latitude__isnull=False, longitude__isnull=False
+        ):
+            clusters.append(
+                {
+                    "center": [donation.latitude, donation.longitude],
+                    "donations": [donation.id],
+                    "stats": {
+                        "total": 1,
+                        "available": 0 if donation.is_claimed else 1,
+                        "claimed": 1 if donation.is_claimed else 0,
+                        "food_types": {
+                            donation.food_type or "other": 1
+                        },
+                    },
+                }
+            )
+        return clusters
+
     def _create_geographic_clusters(self, queryset, grid_size):
         """Create geographic clusters based on grid size"""
         clusters = {}
@@ -421,6 +876,7 @@ class DonationViewSet(viewsets.ModelViewSet):
 class MeView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    schema = AutoSchema(operation_id_base="Me")
 
     def get_object(self):
         return self.request.user
@@ -437,9 +893,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only view their own profile or public profiles
+        queryset = User.objects.select_related("profile")
         if self.action == "retrieve":
-            return User.objects.all()
-        return User.objects.filter(id=self.request.user.id)
+            return queryset
+        return queryset.filter(id=self.request.user.id)
 
     def get_permissions(self):
         if self.action in ["update", "partial_update"]:
@@ -464,23 +921,96 @@ class UserViewSet(viewsets.ModelViewSet):
             )
         return super().partial_update(request, *args, **kwargs)
 
+    def destroy(self, request, *args, **kwargs):
+        # Their donations can take a while to go; the account is
+        # deactivated at once and the rest happens in the background
+        deletion.schedule_user_deletion(self.get_object())
+        return Response(
+            {"message": "Account scheduled for deletion"},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     @action(detail=True, methods=["get"])
     def donations(self, request, pk=None):
         """Get all donations by a specific user"""
         user = self.get_object()
-        donations = Donation.objects.filter(donor=user).order_by(
-            "-created_at"
+        donations = (
+            Donation.objects.filter(donor=user)
+            .select_related("donor")
+            .order_by("-created_at")
         )
-        serializer = DonationSerializer(donations, many=True)
+        serializer = DonationListSerializer(donations, many=True)
         return Response(serializer.data)
 
 
 class UserDonationsView(generics.ListAPIView):
-    serializer_class = DonationSerializer
+    serializer_class = DonationListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user_id = self.kwargs.get("user_id")
-        return Donation.objects.filter(donor_id=user_id).order_by(
-            "-created_at"
+        return (
+            Donation.objects.filter(donor_id=user_id)
+            .select_related("donor")
+            .order_by("-created_at")
         )
+
+
+class ReceiverAreaViewSet(viewsets.ModelViewSet):
+    """A receiver's saved areas; new donations inside one notify them"""
+
+    serializer_class = ReceiverAreaSerializer
+    permission_classes = [permissions.IsAuthenticated, IsReceiver]
+
+    def get_queryset(self):
+        return self.request.user.receiver_areas.order_by("id")
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class DemandViewSet(viewsets.ModelViewSet):
+    """A receiver's demand for batch allocation"""
+
+    serializer_class = DemandSerializer
+    permission_classes = [permissions.IsAuthenticated, IsReceiver]
+
+    def get_queryset(self):
+        return self.request.user.demands.order_by("id")
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(
+            user=self.request.user, donation__deleted_at__isnull=True
+        ).select_related("donation", "donation__donor")
+        if self.request.query_params.get("unread") == "true":
+            queryset = queryset.filter(read_at__isnull=True)
+        if self.action == "list":
+            return queryset[: settings.NOTIFICATIONS["LIST_LIMIT"]]
+        return queryset
+
+    @action(detail=False, methods=["post"])
+    def read(self, request):
+        """Mark the notifications in ``ids`` read, or all of them"""
+        ids = request.data.get("ids")
+        queryset = Notification.objects.filter(
+            user=request.user, read_at__isnull=True
+        )
+        if ids is not None:
+            if not isinstance(ids, list) or not all(
+                isinstance(pk, int) for pk in ids
+            ):
+                return Response(
+                    {"error": "ids must be a list of integers"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = queryset.filter(id__in=ids)
+        marked = queryset.update(read_at=timezone.now())
+        return Response({"marked": marked})
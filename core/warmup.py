@@ -0,0 +1,71 @@
+"""Startup work for web workers
+
+Django and DRF do a lot lazily: the URLconf, and with it every view and
+serializer module, is imported on the first request, route patterns
+are compiled on first resolve, and model metadata and serializer fields
+are built the first time a serializer is used. Each new worker would
+make its first requests pay for all of it, which under autoscaling is
+a steady share of requests. ``warm()`` runs it once at startup, from
+``foodbridge.wsgi`` and ``foodbridge.asgi``, before the worker takes
+traffic.
+"""
+
+import inspect
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.urls import get_resolver
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def _resolvers():
+    # Populating the reverse map imports the URLconf and compiles the
+    # pattern of every route
+    get_resolver().reverse_dict
+
+
+def _models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def _serializers():
+    from core import serializers
+
+    for serializer in vars(serializers).values():
+        if (
+            inspect.isclass(serializer)
+            and issubclass(serializer, BaseSerializer)
+            and serializer.__module__ == serializers.__name__
+        ):
+            # Builds the fields and reads the model metadata they use
+            serializer().fields
+
+
+def _schema():
+    from core import schema
+
+    if Path(settings.OPENAPI["PATH"]).exists():
+        schema.get()
+
+
+def warm():
+    """Do the lazy work of a worker's first requests now; returns the
+    milliseconds spent, or None when disabled"""
+    config = settings.WARMUP
+    if not config["ENABLED"]:
+        return None
+    start = time.perf_counter()
+    _resolvers()
+    _models()
+    _serializers()
+    if config["SCHEMA"]:
+        _schema()
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info("Warmed up in %.0f ms", elapsed)
+    return elapsed
@@ -11,6 +11,7 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodbridge.settings")
 django.setup()
 
+from core.accounts import build_user, provision_users
 from core.models import Donation, Profile
 from django.contrib.auth.models import User
 
@@ -107,18 +108,21 @@ def create_users():
         },
     ]
 
-    users = []
-    for user_data in users_data:
-        user = User.objects.create_user(
-            username=user_data["username"],
-            email=user_data["email"],
-            password="password123",
+    # One batch: users and their profiles, roles set on insert
+    users = provision_users(
+        (
+            build_user(
+                user_data["username"],
+                user_data["email"],
+                "password123",
+                user_data["role"],
+            ),
+            user_data["role"],
         )
-        # Set the role on the auto-created profile
-        user.profile.role = user_data["role"]
-        user.profile.save()
-        users.append(user)
-        print(f"Created user: {user.username} ({user_data['role']})")
+        for user_data in users_data
+    )
+    for user in users:
+        print(f"Created user: {user.username} ({user.profile.role})")
 
     return users
 
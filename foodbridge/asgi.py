@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodbridge.settings')
 
 application = get_asgi_application()
+
+from core.warmup import warm  # noqa: E402 (needs the settings)
+
+warm()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -28,6 +29,11 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# "api" runs a worker that serves only the JSON API: no admin, CKEditor,
+# sessions or browsable API, so it starts faster and uses less memory.
+# Serve /admin/ from a separate "full" deployment
+PROFILE = os.environ.get("FOODBRIDGE_PROFILE", "full")
+
 
 # Application definition
 
@@ -45,6 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
+    "core.middleware.CompressionMiddleware",
+    "core.replicas.ReplicaPinMiddleware",
+    "core.querylog.QueryInspectionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -55,6 +65,31 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if PROFILE == "api":
+    # API requests authenticate with JWTs; nothing else needs these
+    INSTALLED_APPS = [
+        app
+        for app in INSTALLED_APPS
+        if app
+        not in (
+            "ckeditor",
+            "django.contrib.admin",
+            "django.contrib.sessions",
+            "django.contrib.messages",
+            "django.contrib.staticfiles",
+        )
+    ]
+    MIDDLEWARE = [
+        middleware
+        for middleware in MIDDLEWARE
+        if middleware
+        not in (
+            "django.contrib.sessions.middleware.SessionMiddleware",
+            "django.contrib.auth.middleware.AuthenticationMiddleware",
+            "django.contrib.messages.middleware.MessageMiddleware",
+        )
+    ]
+
 ROOT_URLCONF = "foodbridge.urls"
 
 TEMPLATES = [
@@ -85,6 +120,25 @@ DATABASES = {
     }
 }
 
+# Optional read replica for the heavy read endpoints (core.replicas).
+# Locally, point it at a copy of db.sqlite3, or at db.sqlite3 itself
+if os.environ.get("DATABASE_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["DATABASE_REPLICA_NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+
+REPLICA = {
+    "ALIAS": "replica",
+    # After a write, the user's reads stay on the primary this long so
+    # they see their own changes despite replication lag
+    "STICKY_SECONDS": 15,
+    "CACHE": "shared",
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,6 +158,32 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Partner accounts use a cheaper scrypt; staff keep PBKDF2. Hashes from
+# another hasher are re-encoded with the policy one on the next login.
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "core.hashers.PartnerScryptPasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+AUTHENTICATION_BACKENDS = ["core.hashers.PolicyModelBackend"]
+
+PASSWORD_HASHING = {
+    # Hasher algorithm per profile role; staff accounts use "staff"
+    "POLICY": {
+        "staff": "pbkdf2_sha256",
+        "donor": "scrypt_partner",
+        "receiver": "scrypt_partner",
+    },
+    # Role whose hasher times logins to unknown usernames; keep it the
+    # slowest policy so staff usernames can't be found by timing
+    "UNKNOWN_USERS": "staff",
+    "WORKERS": 4,  # concurrent hash computations
+    "QUEUE_SIZE": 64,  # hashes waiting for a worker
+    "QUEUE_TIMEOUT": 2.0,  # seconds to wait for a queue slot, then 503
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -127,6 +207,23 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Donation image processing (uploads are re-encoded, variants built async)
+DONATION_IMAGE_FORMAT = "WEBP"  # or "AVIF" when Pillow has libavif
+DONATION_IMAGE_QUALITY = 80
+DONATION_IMAGE_MAX_DIMENSION = 1600
+DONATION_IMAGE_VARIANTS = {
+    "thumbnail": 200,
+    "medium": 800,
+}
+
+# Donation image uploads are streamed, size-checked and hashed as they arrive
+DONATION_UPLOAD_MAX_SIZE = 15 * 1024 * 1024
+DONATION_UPLOAD_SPOOL_THRESHOLD = 1024 * 1024  # bytes kept in memory
+DONATION_UPLOAD_MAX_PIXELS = 40_000_000
+
+# Accounts an admin can invite in one request (each password is hashed)
+USER_INVITE_MAX_BATCH = 100
+
 # CKEditor Configuration
 CKEDITOR_CONFIGS = {
     "default": {
@@ -163,6 +260,187 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.TokenBucketThrottle",
+    ),
+    # Proxies in front of the app whose X-Forwarded-For is trusted.
+    # Anonymous clients are rate limited by IP address; with 0 that
+    # is REMOTE_ADDR, so a spoofed header can't reset a client's
+    # bucket. Behind a load balancer, set this to its number of hops
+    "NUM_PROXIES": 0,
+}
+
+if PROFILE == "api":
+    # Without the browsable API no template is ever loaded
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+    )
+
+# State every worker process must agree on (rate limit buckets, replica
+# pins); on a single host a file-based cache is enough, behind several
+# hosts point "shared" at Redis or Memcached instead
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "core.throttling.BucketFileCache",
+        "LOCATION": BASE_DIR / "cache" / "shared",
+        "OPTIONS": {"MAX_ENTRIES": 100000, "CULL_EVERY": 100},
+    },
+}
+
+# Token-bucket rate limits (core.throttling). "N/period" is a bucket of
+# N requests refilled over the period; period is s, min, hour or day
+THROTTLING = {
+    "ENABLED": True,
+    "CACHE": "shared",
+    "RATES": {
+        "user": "300/min",  # per authenticated user
+        "anon": "60/min",  # per client IP
+    },
+    # Stricter buckets by URL name, on top of the general one
+    "ROUTES": {
+        "donation-statistics": "30/min",
+        "admin-stats": "10/min",
+        "token_obtain_pair": "10/min",
+        "token_refresh": "30/min",
+    },
+}
+
+# Database-backed task queue; `manage.py run_tasks` runs the workers
+TASK_QUEUE = {
+    "EAGER": False,  # run tasks in-process after commit, without a worker
+    "WORKERS": 2,  # pool processes per run_tasks
+    "POLL_INTERVAL": 1.0,  # seconds between polls when idle
+    "MAX_ATTEMPTS": 5,
+    "RETRY_BACKOFF": 5,  # seconds before the first retry, doubling
+    "MAX_BACKOFF": 600,
+    "LOCK_TIMEOUT": 900,  # running tasks older than this are requeued
+    "KEEP_FINISHED_DAYS": 7,
+}
+
+# Matching of new donations against receivers' saved areas
+NOTIFICATIONS = {
+    # Grid of the area index; run reindex_receiver_areas after a change
+    "CELL_DEGREES": 0.1,
+    "MAX_RADIUS_KM": 50,
+    "MAX_AREAS_PER_USER": 10,
+    "BATCH_SIZE": 500,  # notifications per insert and per webhook call
+    "WEBHOOK_URL": None,  # also POST matches here when set
+    "WEBHOOK_TIMEOUT": 5,
+    "LIST_LIMIT": 100,  # most recent notifications listed
+}
+
+# Pickup route planning for receivers
+ROUTING = {
+    "SPEED_KMH": 30,  # average driving speed for arrival estimates
+    "SERVICE_MINUTES": 5,  # time spent at each stop
+    "MAX_STOPS": 200,
+    "TIME_LIMIT_MS": 80,  # 2-opt stops improving after this
+}
+
+# Batch allocation of donations to receivers' demand. While ENABLED,
+# the claim endpoint is closed and `manage.py allocate_donations`
+# (run periodically) hands donations out instead
+ALLOCATION = {
+    "ENABLED": False,
+    "FAIRNESS_WEIGHT": 2.0,  # weight of the share already allocated
+    "DISTANCE_WEIGHT": 1.0,  # weight of distance as a share of radius
+    "MAX_RADIUS_KM": 50,
+    "MAX_DEMANDS_PER_USER": 10,
+    "BATCH_SIZE": 500,  # claims per write transaction
+}
+
+# Idempotency-Key handling on write endpoints (core.idempotency).
+# Expired keys are removed by `manage.py purge_idempotency_keys`
+IDEMPOTENCY = {
+    "HEADER": "Idempotency-Key",
+    "TTL_HOURS": 24,  # how long a key's response can be replayed
+    "IN_PROGRESS_TIMEOUT": 60,  # seconds before an unfinished key is reusable
+}
+
+# Archival of old donations by `manage.py archive_donations` (run
+# periodically). Keep RETENTION_DAYS above 180: admin stats' recent
+# activity and six-month trends read only the live table
+ARCHIVE = {
+    "RETENTION_DAYS": 365,  # claimed or expired and older than this
+    "BATCH_SIZE": 1000,  # donations moved per transaction
+    "PAGE_SIZE": 100,  # admin listing of the archive
+    "MAX_PAGE_SIZE": 1000,
+}
+
+# Soft deletion (core.deletion). `manage.py purge_deleted_donations`
+# (run periodically) removes deleted rows and their images
+SOFT_DELETE = {
+    "PURGE_AFTER_HOURS": 24,  # how long deleted donations are kept
+    "BATCH_SIZE": 500,  # rows per transaction when purging
+}
+
+# Served at /api/schema/ (core.schema). `manage.py
+# generate_openapi_schema` prebuilds PATH; without the file the schema
+# is generated on first use in each process
+OPENAPI = {
+    "TITLE": "FoodBridge API",
+    "VERSION": "1.0.0",
+    "DESCRIPTION": "Food donation and pickup coordination",
+    "PATH": BASE_DIR / "openapi.json",
+}
+
+# Response compression (core.middleware.CompressionMiddleware).
+# Brotli is offered when the Brotli package is installed
+COMPRESSION = {
+    "ENABLED": True,
+    "MIN_SIZE": 1024,  # bytes; smaller bodies are sent as they are
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 5,  # 0-11; above ~6 costs more than it saves
+    "CONTENT_TYPES": (
+        "application/json",
+        "application/msgpack",
+        "application/vnd.oai.openapi+json",
+        "text/",
+    ),
+}
+
+# Work done once when a web worker starts (core.warmup) instead of on
+# its first requests
+WARMUP = {
+    "ENABLED": True,
+    "SCHEMA": True,  # load the prebuilt OPENAPI["PATH"], if there is one
+}
+
+# Rolling windows (days) the leaderboard can rank over
+LEADERBOARD_WINDOWS = (7, 30, 365)
+LEADERBOARD_MAX_LIMIT = 100
+
+# Geocoding of donation locations; results are cached in GeocodeCache.
+# Use "core.geocoding.NominatimProvider" to resolve real addresses.
+GEOCODING = {
+    "PROVIDER": "core.geocoding.GazetteerProvider",
+    "GAZETTEER": None,  # JSON file of {"place": [lat, lng]}
+    "USER_AGENT": "foodbridge-backend",
+}
+
+# Per-route request metrics, served at /api/admin/metrics/
+REQUEST_METRICS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,  # fraction of requests measured
+}
+
+# Development/staging query inspection: logs slow statements with their
+# plan and flags statement shapes repeated more than REPEAT_THRESHOLD times
+QUERY_INSPECTION = {
+    "ENABLED": DEBUG,
+    "REPEAT_THRESHOLD": 10,
+    "SLOW_QUERY_MS": 100,
+    "EXPLAIN": True,
+    "RAISE": False,  # raise RepeatedQueryError instead of logging
 }
 
 # Simple JWT settings
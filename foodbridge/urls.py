@@ -15,17 +15,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.apps import apps
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+from core.views import serve_image_blob
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/", include("core.urls")),
     # JWT endpoints:
     path(
@@ -40,8 +41,25 @@ urlpatterns = [
     ),
 ]
 
-# Serve media files in development
+# Not installed in API-only workers (settings.PROFILE)
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns += [path("admin/", admin.site.urls)]
+
+# Serve media files in development. Content-addressed donation images
+# never change once written and get far-future cache headers; in
+# production the front-end server serves MEDIA_ROOT and must send the
+# same headers for donations/ (see README, Donation Images)
 if settings.DEBUG:
+    urlpatterns += [
+        re_path(
+            r"^%s(?P<path>donations/[0-9a-f]{2}/[0-9a-f]{64}[^/]*)$"
+            % settings.MEDIA_URL.lstrip("/"),
+            serve_image_blob,
+            name="image-blob",
+        ),
+    ]
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
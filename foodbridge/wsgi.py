@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodbridge.settings')
 
 application = get_wsgi_application()
+
+from core.warmup import warm  # noqa: E402 (needs the settings)
+
+warm()